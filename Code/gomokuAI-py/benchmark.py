@@ -0,0 +1,193 @@
+from source.AI import GomokuAI
+from source.positions import POSITIONS, CORPUS, EXPECTED, setup_position
+import argparse
+import json
+import math
+import sys
+import time
+
+# Search benchmark on the fixed position corpus (opening, midgame, tactical
+# and near-full boards). For every position and depth it reports nodes,
+# nodes/sec, transposition table hit rate, evaluate calls, time and move,
+# then per depth the average nodes and the tactical positions answered right.
+# Example:
+#   python benchmark.py --depth 3 --depth 4 --json bench.json
+#   python benchmark.py --depth 3 --depth 4 --baseline bench.json
+#   python benchmark.py --depth 4 --verify
+#   python benchmark.py --depth 6 --iterative --plain --json plain.json
+#   python benchmark.py --depth 4 --depth 6 --fixed-width --json fixed.json
+
+# GomokuAI settings of the comparison modes
+PLAIN = {'pvSearch': False, 'aspirationWindow': None}  # no PVS, no aspiration windows
+FIXED_WIDTH = {'adaptiveWidth': False, 'lateMoveReduction': False}  # top-k candidates only
+
+
+def run_position(name, depth, symmetric=False, mode='root', settings=None):
+    """
+        Search a position from a fresh engine and return its measurements.
+            mode = 'root' (searchRoot), 'iterative' (iterative deepening up
+                   to depth, no time limit) or 'reference' (minimax)
+            settings = GomokuAI attributes set before the search
+    """
+    ai = setup_position(GomokuAI(depth=depth, symmetricHashing=symmetric), POSITIONS[name])
+    for attribute, value in (settings or {}).items():
+        setattr(ai, attribute, value)
+    ai.newSearch()
+    ai.TTable.resetStats()
+    start_time = time.time()
+    if mode == 'reference':
+        ai.minimax(depth, ai.boardValue, ai.nextBound, -math.inf, math.inf, True)
+    elif mode == 'iterative':
+        ai.iterativeDeepening(depth, math.inf)
+    else:
+        ai.searchRoot(depth, ai.boardValue, ai.nextBound)
+    elapsed = time.time() - start_time
+    move = (ai.currentI, ai.currentJ)
+    return {
+        'position': name,
+        'depth': depth,
+        'nodes': ai.nodeCount,
+        'nps': ai.nodeCount / elapsed if elapsed > 0 else 0.0,
+        'tt_hit_rate': ai.TTable.stats()['hit_rate'],
+        'evaluations': ai.evalCount,
+        'time': elapsed,
+        'move': list(move),
+        'score': ai.boardValue,
+        'correct': move in EXPECTED[name] if name in EXPECTED else None,
+    }
+
+
+def run_benchmark(names, depths, symmetric=False, mode='root', settings=None):
+    results = []
+    print('{:<14} {:>5} {:>10} {:>10} {:>7} {:>10} {:>8}  {:<10}'.format(
+        'position', 'depth', 'nodes', 'nodes/s', 'tt hit', 'evals', 'time', 'move'))
+    for depth in depths:
+        for name in names:
+            result = run_position(name, depth, symmetric, mode, settings)
+            results.append(result)
+            flag = '' if result['correct'] is None else (' ok' if result['correct'] else ' WRONG')
+            print('{:<14} {:>5} {:>10} {:>10.0f} {:>6.1f}% {:>10} {:>7.2f}s  {:<10}{}'.format(
+                name, depth, result['nodes'], result['nps'], 100 * result['tt_hit_rate'],
+                result['evaluations'], result['time'], str(tuple(result['move'])), flag))
+    summarize(results)
+    return results
+
+
+def summarize(results):
+    """Average nodes per position and tactical positions answered right, per depth"""
+    for depth in sorted(set(result['depth'] for result in results)):
+        row = [result for result in results if result['depth'] == depth]
+        tactical = [result['correct'] for result in row if result['correct'] is not None]
+        print('depth {}: {:.0f} nodes per position, tactical {}/{} correct'.format(
+            depth, sum(result['nodes'] for result in row) / len(row), sum(tactical), len(tactical)))
+
+
+def verify(results, symmetric=False, settings=None):
+    """
+        Search every position again with the minimax reference and with
+        searchRoot on the same candidates (late move reductions change the
+        tree), and compare the root scores, which must be equal.
+        Returns the number of mismatches.
+    """
+    mismatches = 0
+    for result in results:
+        label = '{} depth {}'.format(result['position'], result['depth'])
+        reference = run_position(result['position'], result['depth'], symmetric, 'reference', settings)
+        exact = run_position(result['position'], result['depth'], symmetric, 'root',
+                             dict(settings or {}, lateMoveReduction=False))
+        if exact['score'] != reference['score']:
+            print('MISMATCH   {}: score {} (minimax {}), move {} (minimax {})'.format(
+                label, exact['score'], reference['score'],
+                tuple(exact['move']), tuple(reference['move'])))
+            mismatches += 1
+        elif exact['move'] != reference['move']:
+            print('same score {}: move {} (minimax {})'.format(
+                label, tuple(exact['move']), tuple(reference['move'])))
+        if result['nodes'] != reference['nodes']:
+            print('nodes      {}: {} (minimax {}, {:+.1f}%)'.format(
+                label, result['nodes'], reference['nodes'],
+                100 * (result['nodes'] / reference['nodes'] - 1)))
+    print('{} mismatch(es) against the minimax reference'.format(mismatches))
+    return mismatches
+
+
+def compare_baseline(results, baseline, tolerance, time_tolerance):
+    """
+        Compare the results against a saved run. A regression is a node count
+        (or a time, if time_tolerance is given) above the baseline by more
+        than the tolerance, or a wrong answer on a tactical position that
+        the baseline answered correctly.
+        A different move is only reported.
+    """
+    saved = {(result['position'], result['depth']): result for result in baseline}
+    regressions = 0
+    for result in results:
+        key = (result['position'], result['depth'])
+        label = '{} depth {}'.format(*key)
+        before = saved.get(key)
+        if result['correct'] is False:
+            if before is None or before['correct']:
+                print('REGRESSION {}: wrong move {}'.format(label, tuple(result['move'])))
+                regressions += 1
+            else:
+                print('wrong      {}: move {} (also wrong in the baseline)'.format(label, tuple(result['move'])))
+        if before is None:
+            continue
+        if result['nodes'] > before['nodes'] * (1 + tolerance):
+            print('REGRESSION {}: nodes {} -> {} ({:+.1f}%)'.format(
+                label, before['nodes'], result['nodes'], 100 * (result['nodes'] / before['nodes'] - 1)))
+            regressions += 1
+        if time_tolerance is not None and result['time'] > before['time'] * (1 + time_tolerance):
+            print('REGRESSION {}: time {:.2f}s -> {:.2f}s'.format(label, before['time'], result['time']))
+            regressions += 1
+        if result['move'] != before['move']:
+            print('changed    {}: move {} -> {}'.format(label, tuple(before['move']), tuple(result['move'])))
+    print('{} regression(s) against the baseline'.format(regressions))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the search on the position corpus')
+    parser.add_argument('--depth', type=int, action='append', help='search depth, repeatable (default 4)')
+    parser.add_argument('--category', choices=list(CORPUS), action='append',
+                        help='only the positions of a corpus category, repeatable')
+    parser.add_argument('--symmetric', action='store_true', help='symmetry-aware TT hashing')
+    parser.add_argument('--iterative', action='store_true',
+                        help='search with iterative deepening up to the depth')
+    parser.add_argument('--plain', action='store_true',
+                        help='search without PVS and aspiration windows')
+    parser.add_argument('--fixed-width', action='store_true',
+                        help='top-k candidates only: no threat moves, width schedule or reductions')
+    parser.add_argument('--verify', action='store_true',
+                        help='check the root scores against the minimax reference search')
+    parser.add_argument('--json', default=None, help='save the results to a JSON file')
+    parser.add_argument('--baseline', default=None, help='JSON results of a previous run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='allowed node count increase over the baseline (default 0.10)')
+    parser.add_argument('--time-tolerance', type=float, default=None,
+                        help='allowed time increase over the baseline (default: time not checked)')
+    parser.add_argument('positions', nargs='*', help='positions to search (default: all)')
+    args = parser.parse_args()
+
+    names = args.positions or list(POSITIONS)
+    if args.category:
+        names = [name for category in args.category for name in CORPUS[category]]
+    settings = {}
+    if args.plain:
+        settings.update(PLAIN)
+    if args.fixed_width:
+        settings.update(FIXED_WIDTH)
+    results = run_benchmark(names, args.depth or [4], args.symmetric,
+                            'iterative' if args.iterative else 'root', settings)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print('Results saved to', args.json)
+    failed = args.verify and verify(results, args.symmetric, settings)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        failed = compare_baseline(results, baseline, args.tolerance, args.time_tolerance) or failed
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,111 @@
+from source.AI import GomokuAI, N
+from source.book import position_key, write_book, OpeningBook
+from source.symmetry import CELL_MAP
+import source.utils as utils
+import argparse
+import json
+import time
+
+# Offline builder of the opening book read by GomokuAI(book=...).
+# From deep searches, expanding the best moves of every position:
+#   python build_book.py --search --plies 8 --depth 6 --branch 3 --out opening.book
+# From self-play games (JSONL written by self_play.py):
+#   python build_book.py --games games.jsonl --plies 10 --min-games 2 --out opening.book
+# Moves are lists of (i, j) from the empty board, black first.
+
+
+def split_stones(moves):
+    """(stones of the side to move, stones of the other side)"""
+    mover = len(moves) % 2
+    return moves[mover::2], moves[1 - mover::2]
+
+
+def book_entry(zobrist, moves, move):
+    """(key, canonical move) of playing `move` after `moves`"""
+    mine, theirs = split_stones(moves)
+    key, t = position_key(zobrist[0], zobrist[1], mine, theirs)
+    return key, CELL_MAP[t][move[0] * N + move[1]]
+
+
+def search_position(moves, depth, branch):
+    """Best move of the side to move by searchRoot, and the top candidates"""
+    if not moves:
+        return (7, 7), [(7, 7)]
+    ai = GomokuAI(depth=depth)
+    mover = len(moves) % 2
+    for ply, (i, j) in enumerate(moves):
+        ai.playMove(i, j, 1 if ply % 2 == mover else -1)
+    ai.turn = 1
+    candidates = list(ai.childNodes(ai.nextBound, branch))
+    ai.newSearch()
+    ai.searchRoot(depth, ai.boardValue, ai.nextBound)
+    best = (ai.currentI, ai.currentJ)
+    return best, [best] + [move for move in candidates if move != best][:branch - 1]
+
+
+def build_from_search(zobrist, plies, depth, branch):
+    """Search every position reached by the top `branch` moves, up to `plies` stones"""
+    entries = {}
+    seen = set()
+    level = [[]]
+    for ply in range(plies):
+        start_time = time.time()
+        next_level = []
+        for moves in level:
+            mine, theirs = split_stones(moves)
+            key, _ = position_key(zobrist[0], zobrist[1], mine, theirs)
+            if key in seen:
+                continue  # same position up to symmetry already searched
+            seen.add(key)
+            best, children = search_position(moves, depth, branch)
+            entries[book_entry(zobrist, moves, best)] = 1
+            next_level += [moves + [child] for child in children]
+        print('Ply {}: {} positions in {:.1f}s'.format(ply, len(seen), time.time() - start_time))
+        level = next_level
+    return entries
+
+
+def build_from_games(zobrist, paths, plies, min_games):
+    """Score every book move by the games won minus the games lost after it"""
+    scores = {}
+    counts = {}
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                record = json.loads(line)
+                moves = [tuple(move) for move in record['moves']]
+                for ply, move in enumerate(moves[:plies]):
+                    entry = book_entry(zobrist, moves[:ply], move)
+                    winner = 'black' if ply % 2 == 0 else 'white'
+                    result = 0 if record['winner'] == 'draw' else (1 if record['winner'] == winner else -1)
+                    scores[entry] = scores.get(entry, 0) + result
+                    counts[entry] = counts.get(entry, 0) + 1
+    return {entry: score for entry, score in scores.items()
+            if counts[entry] >= min_games and score >= 0}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the opening book')
+    parser.add_argument('--search', action='store_true', help='build from deep searches')
+    parser.add_argument('--games', nargs='*', default=[], help='self-play JSONL files')
+    parser.add_argument('--plies', type=int, default=8, help='stones on the board covered by the book')
+    parser.add_argument('--depth', type=int, default=6, help='search depth (--search)')
+    parser.add_argument('--branch', type=int, default=3, help='moves expanded per position (--search)')
+    parser.add_argument('--min-games', type=int, default=2, help='games needed per move (--games)')
+    parser.add_argument('--seed', type=int, default=utils.ZOBRIST_SEED, help='zobrist seed of the engines')
+    parser.add_argument('--out', default='opening.book')
+    args = parser.parse_args()
+
+    zobrist = utils.init_zobrist(args.seed)
+    entries = {}
+    if args.search:
+        entries.update(build_from_search(zobrist, args.plies, args.depth, args.branch))
+    if args.games:
+        # Self-play statistics take precedence over single search results
+        entries.update(build_from_games(zobrist, args.games, args.plies, args.min_games))
+    if not entries:
+        parser.error('nothing to build: give --search and/or --games')
+    write_book(args.out, entries, args.seed)
+    book = OpeningBook(args.out)
+    print('Opening book saved to {} ({} moves)'.format(args.out, len(book)))
+    book.close()
@@ -0,0 +1,44 @@
+from source.AI import GomokuAI
+from source.positions import POSITIONS, setup_position
+import argparse
+import time
+
+# Node count comparison of the search with and without move ordering
+# (hash move, killer moves and history heuristic) on the fixed positions
+
+
+def search_position(moves, depth, ordering):
+    """Search a position from a fresh engine, return (nodes, time, move)"""
+    ai = setup_position(GomokuAI(depth=depth), moves)
+    ai.moveOrdering = ordering
+    ai.newSearch()
+    start_time = time.time()
+    ai.searchRoot(depth, ai.boardValue, ai.nextBound)
+    end_time = time.time()
+    return ai.nodeCount, end_time - start_time, (ai.currentI, ai.currentJ)
+
+
+def compare_ordering(depth, names):
+    """Print the nodes searched by both modes for every position"""
+    print('{:<14} {:>10} {:>10} {:>10}  {:<10} {:<10}'.format(
+        'position', 'plain', 'ordered', 'reduction', 'move', 'move(ord)'))
+    total_plain = total_ordered = 0
+    for name in names:
+        plain_nodes, _, plain_move = search_position(POSITIONS[name], depth, False)
+        ordered_nodes, _, ordered_move = search_position(POSITIONS[name], depth, True)
+        total_plain += plain_nodes
+        total_ordered += ordered_nodes
+        print('{:<14} {:>10} {:>10} {:>9.1f}%  {:<10} {:<10}'.format(
+            name, plain_nodes, ordered_nodes, 100 * (1 - ordered_nodes / plain_nodes),
+            str(plain_move), str(ordered_move)))
+    print('{:<14} {:>10} {:>10} {:>9.1f}%'.format(
+        'total', total_plain, total_ordered, 100 * (1 - total_ordered / total_plain)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare search nodes with and without move ordering')
+    parser.add_argument('--depth', type=int, default=4, help='search depth (default 4)')
+    parser.add_argument('positions', nargs='*', default=list(POSITIONS),
+                        help='positions to search (default: all)')
+    args = parser.parse_args()
+    compare_ordering(args.depth, args.positions)
@@ -2,20 +2,24 @@ from gui.interface import *
 from source.AI import *
 from gui.button import Button
 import source.utils as utils
-import source.gomoku as gomoku
 import pygame
+import os
+import sys
+from source.worker import SearchWorker
 
 # Game initializer function
 # Link interface with gomoku moves and AI
 # Script to be run
 
+BOOK = 'opening.book'  # opening book built by build_book.py, used if present
+PONDER_REPLIES = 3  # human replies searched during the human's turn (0 = no pondering)
 
 pygame.init()
 
 def startGame():
     pygame.init()
     # Initializations
-    ai = GomokuAI()
+    ai = GomokuAI(book=BOOK if os.path.exists(BOOK) else None)
     game = GameUI(ai)
     button_black = Button(game.buttonSurf, 200, 290, "BLACK", 22)
     button_white = Button(game.buttonSurf, 340, 290, "WHITE", 22)
@@ -39,6 +43,8 @@ def startGame():
                 
                 if game.ai.turn == 1:
                     game.ai.firstMove()
+                    game.ai.updateHash(game.ai.currentI, game.ai.currentJ, 1)
+                    game.ai.emptyCells -= 1
                     game.drawPiece('black', game.ai.currentI, game.ai.currentJ)
                     pygame.display.update()
                     game.ai.turn *= -1
@@ -102,28 +108,53 @@ def main(game):
     pygame.init()
     end = False
     result = game.ai.checkResult()
+    # The AI searches in a background thread, so the window keeps repainting
+    # and handling events at FPS while it thinks
+    worker = SearchWorker(game.ai, PONDER_REPLIES)
+    clock = pygame.time.Clock()
+    frame = 0
+    ready_move = None  # AI answer found while pondering
+    # Engine state is only read or changed when the worker is idle (the turn is kept here)
+    next_turn = game.ai.turn
 
     while not end:
-        turn = game.ai.turn
+        clock.tick(FPS)
+        turn = next_turn
         color = game.colorState[turn] # black or white depending on player's choice
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
 
-            # AI's turn
-            if turn == 1:
-                move_i, move_j = gomoku.ai_move(game.ai)
+        # AI's turn: start the search, then apply the move once it is found
+        if turn == 1:
+            if ready_move is None and worker.future is None:
+                worker.search()
+            elif ready_move is not None or worker.done():
+                move_i, move_j = ready_move or worker.result()
+                ready_move = None
+                game.ai.currentI, game.ai.currentJ = move_i, move_j
+                pygame.display.set_caption('Play Gomoku!')
                 # Make the move and update zobrist hash
                 game.ai.setState(move_i, move_j, turn)
-                game.ai.rollingHash ^= game.ai.zobristTable[move_i][move_j][0]
+                game.ai.updateHash(move_i, move_j, 1)
                 game.ai.emptyCells -= 1
 
                 game.drawPiece(color, move_i, move_j)
                 result = game.ai.checkResult()
                 # Switch turn
-                game.ai.turn *= -1
+                game.ai.turn = next_turn = -turn
                 print("AI's Turn")
                 print(game.ai.nextBound)
+                # Think on the human's time
+                if result is None:
+                    worker.ponder()
+            else:
+                # Thinking indicator
+                frame += 1
+                pygame.display.set_caption('Play Gomoku! AI is thinking' + '.' * (frame // 20 % 4))
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                worker.shutdown()
+                pygame.quit()
+                sys.exit()
 
             # Human's turn
             if turn == -1:
@@ -136,27 +167,34 @@ def main(game):
                     move_j = human_move[1]
                     # print(mouse_pos, move_i, move_j)
 
-                    # Check the validity of human's move
-                    if game.ai.isValid(move_i, move_j):
-                        # game.ai.boardValue = game.ai.evaluate(move_i, move_j, game.ai.boardValue, -1, game.ai.nextBound)
-                        game.ai.updateBound(move_i, move_j, game.ai.nextBound)
-                        game.ai.boardValue = game.ai.evaluate(move_i, move_j, game.ai.boardValue, -1, game.ai.nextBound)
-                        game.ai.currentI, game.ai.currentJ = move_i, move_j
-                        # Make the move and update zobrist hash
-                        game.ai.setState(move_i, move_j, turn)
-                        game.ai.rollingHash ^= game.ai.zobristTable[move_i][move_j][1]
-                        game.ai.emptyCells -= 1
+                    # Check the validity of human's move (on the board before pondering)
+                    if worker.isValid(move_i, move_j):
+                        # Stop pondering: on a pondered reply the engine already played the move
+                        ready_move = worker.ponderHit(move_i, move_j)
+                        if ready_move is not None:
+                            print('Ponder hit: ', ready_move)
+                        else:
+                            # game.ai.boardValue = game.ai.evaluate(move_i, move_j, game.ai.boardValue, -1, game.ai.nextBound)
+                            game.ai.updateBound(move_i, move_j, game.ai.nextBound)
+                            game.ai.boardValue = game.ai.evaluate(move_i, move_j, game.ai.boardValue, -1, game.ai.nextBound)
+                            game.ai.currentI, game.ai.currentJ = move_i, move_j
+                            # Make the move and update zobrist hash
+                            game.ai.setState(move_i, move_j, turn)
+                            game.ai.updateHash(move_i, move_j, -1)
+                            game.ai.emptyCells -= 1
                         
                         game.drawPiece(color, move_i, move_j)
                         result =  game.ai.checkResult()
-                        game.ai.turn *= -1
+                        game.ai.turn = next_turn = -turn
                         print("Human's Turn")
                         print(game.ai.nextBound)
 
             
-            if result != None:
-                # End game
-                end = True
+        if result != None:
+            # End game
+            end = True
+
+    worker.shutdown()
 
 
 
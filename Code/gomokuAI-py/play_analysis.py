@@ -219,6 +219,8 @@ def startGame():
                     # Measure AI's first move time
                     start_time = time.time()
                     game.ai.firstMove()
+                    game.ai.updateHash(game.ai.currentI, game.ai.currentJ, 1)
+                    game.ai.emptyCells -= 1
                     end_time = time.time()
                     ai_time = end_time - start_time
                     
@@ -323,7 +325,7 @@ def main(game, move_time_data, player_moves, ai_times):
                 
                 # Make the move and update zobrist hash
                 game.ai.setState(move_i, move_j, turn)
-                game.ai.rollingHash ^= game.ai.zobristTable[move_i][move_j][0]
+                game.ai.updateHash(move_i, move_j, 1)
                 game.ai.emptyCells -= 1
 
                 game.drawPiece(color, move_i, move_j)
@@ -367,7 +369,7 @@ def main(game, move_time_data, player_moves, ai_times):
                         game.ai.currentI, game.ai.currentJ = move_i, move_j
                         # Make the move and update zobrist hash
                         game.ai.setState(move_i, move_j, turn)
-                        game.ai.rollingHash ^= game.ai.zobristTable[move_i][move_j][1]
+                        game.ai.updateHash(move_i, move_j, -1)
                         game.ai.emptyCells -= 1
                         
                         game.drawPiece(color, move_i, move_j)
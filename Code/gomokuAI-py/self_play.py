@@ -0,0 +1,147 @@
+from source.AI import GomokuAI, N
+import source.gomoku as gomoku
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import importlib
+import json
+import random
+import time
+
+# Headless AI-vs-AI games (no pygame), run in parallel across processes.
+# Every game is streamed as one JSON line: moves, per-move times and node
+# counts, winner. Example:
+#   python self_play.py --black depth=4 --white depth=3,k=8 --games 100 --out games.jsonl
+
+COLUMNS = ['game', 'black', 'white', 'swapped', 'winner', 'plies', 'moves', 'times', 'nodes', 'duration']
+
+
+def parse_player(spec):
+    """Parse 'depth=4,k=5,patterns=module:function' into a player config"""
+    config = {'depth': 4, 'k': 5, 'patterns': None, 'time': None}
+    for item in filter(None, spec.split(',')):
+        key, value = item.split('=', 1)
+        if key not in config:
+            raise ValueError('Unknown player option: ' + key)
+        config[key] = value if key == 'patterns' else (float(value) if key == 'time' else int(value))
+    return config
+
+
+def create_engine(config):
+    """Build a GomokuAI from a player config"""
+    ai = GomokuAI(depth=config['depth'], timeBudget=config['time'])
+    ai.width = config['k']
+    if config['patterns']:
+        module, function = config['patterns'].split(':')
+        ai.setPatternDict(getattr(importlib.import_module(module), function)())
+    return ai
+
+
+def play_game(game_id, black, white, opening_plies=0, seed=0, swapped=False):
+    """
+        Play one game between two player configs and return its record.
+        Each engine sees its own stones as AI (1) and the other's as human (-1).
+        The first opening_plies moves are random cells near the centre, so
+        that deterministic engines do not replay the same game.
+    """
+    rng = random.Random(seed)
+    engines = [create_engine(black), create_engine(white)]
+    moves, times, nodes = [], [], []
+    winner = None
+    start_game = time.time()
+
+    for ply in range(N * N):
+        player, opponent = engines[ply % 2], engines[1 - ply % 2]
+        start_time = time.time()
+        player.nodeCount = 0
+        if ply < opening_plies:
+            empty = [(i, j) for i in range(5, 10) for j in range(5, 10) if player.isValid(i, j)]
+            move_i, move_j = rng.choice(empty)
+            player.playMove(move_i, move_j, 1)
+        else:
+            move_i, move_j = gomoku.ai_turn(player, verbose=False)
+        times.append(time.time() - start_time)
+        nodes.append(player.nodeCount)
+        moves.append((move_i, move_j))
+        gomoku.human_turn(opponent, move_i, move_j)
+
+        result = player.checkResult()
+        if result == 1:
+            winner = 'black' if ply % 2 == 0 else 'white'
+            break
+        if result == 0:
+            winner = 'draw'
+            break
+
+    return {
+        'game': game_id,
+        'black': black,
+        'white': white,
+        'swapped': swapped,
+        'winner': winner or 'draw',
+        'plies': len(moves),
+        'moves': moves,
+        'times': times,
+        'nodes': nodes,
+        'duration': time.time() - start_game,
+    }
+
+
+def write_parquet(records, path):
+    """Write the records as a columnar Parquet file (needs pyarrow)"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("pyarrow library not installed. Parquet file not written.")
+        return
+    columns = {name: [record[name] for record in records] for name in COLUMNS}
+    columns['black'] = [json.dumps(config) for config in columns['black']]
+    columns['white'] = [json.dumps(config) for config in columns['white']]
+    pq.write_table(pa.table(columns), path)
+    print('Parquet results saved to', path)
+
+
+def run_matches(black, white, games, workers, out, parquet=None, opening_plies=2, swap=True, seed=0):
+    """Run the games across a process pool and stream them to the JSONL file"""
+    records = []
+    score = {'A': 0, 'B': 0, 'draw': 0}  # A = --black player, B = --white player
+    with ProcessPoolExecutor(max_workers=workers) as executor, open(out, 'w') as f:
+        futures = []
+        for game_id in range(games):
+            # With swap, odd games give player A the white stones
+            swapped = swap and game_id % 2 == 1
+            pair = (white, black) if swapped else (black, white)
+            futures.append(executor.submit(play_game, game_id, pair[0], pair[1],
+                                           opening_plies, seed + game_id, swapped))
+        for future in as_completed(futures):
+            record = future.result()
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+            records.append(record)
+            if record['winner'] == 'draw':
+                score['draw'] += 1
+            else:
+                score['A' if (record['winner'] == 'black') != record['swapped'] else 'B'] += 1
+            print('Game {} finished in {:.1f}s: {} wins after {} plies'.format(
+                record['game'], record['duration'], record['winner'], record['plies']))
+
+    print('Results:', score)
+    if parquet:
+        write_parquet(sorted(records, key=lambda record: record['game']), parquet)
+    return records
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Headless AI-vs-AI self-play')
+    parser.add_argument('--black', default='', help="black player options, e.g. 'depth=4,k=5'")
+    parser.add_argument('--white', default='', help="white player options, e.g. 'depth=3,time=1.5'")
+    parser.add_argument('--games', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: all cores)')
+    parser.add_argument('--out', default='self_play.jsonl', help='JSONL results file')
+    parser.add_argument('--parquet', default=None, help='also write a Parquet file (needs pyarrow)')
+    parser.add_argument('--opening', type=int, default=2, help='random opening plies per game')
+    parser.add_argument('--no-swap', action='store_true', help='do not alternate colours')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    run_matches(parse_player(args.black), parse_player(args.white), args.games, args.workers,
+                args.out, args.parquet, args.opening, not args.no_swap, args.seed)
@@ -1,32 +1,155 @@
 import math
 import sys
+import time
 import source.utils as utils
 from heapq import nlargest
+from source.bitboard import BitBoard
+from source.candidates import MoveCandidates
+from source.transposition import TranspositionTable, EXACT, LOWER, UPPER
+from source.threats import ThreatSolver, LineThreats, bits, to_move
+from source.book import OpeningBook
+from source.stats import SearchStats
+from source.symmetry import CELL_MAP, INVERSE, TRANSFORMS, canonical, transform_move
+from source.patterns import ShapeTable, SEGMENTS, LINES, LINE_LENGTHS, CELL_LINES, DIGIT, POW3
 
 sys.setrecursionlimit(1500)
 
 N = 15  # board size 15x15
+MAX_PLY = 64  # deepest ply tracked by the killer moves
+TIME_CHECK = 255  # the search deadline is checked every TIME_CHECK + 1 nodes
+NULL_WINDOW = 1  # width of the PVS scout windows (pattern scores are multiples of 100)
+ASPIRATION = 200_000  # half width of the iterative deepening aspiration window (an open three)
+MIN_WIDTH = 3  # fewest candidates kept by the adaptive width
+LMR_MOVES = 3  # moves searched at full depth before the late move reductions
+LMR_SCORE = 10_000  # candidates scored below this are reduced (a gap three)
+
+
+# Raised inside the search when the time budget runs out or the search is cancelled
+class SearchTimeout(Exception):
+    pass
+
+
+class PrincipalVariation():
+    '''
+        Result of a root search:
+            moves     = best line [(i, j), ...] from the AI move (cut short
+                        where the search stopped on a TT entry)
+            score     = value of the line for the AI, searched to depth
+            ourScore  = candidate score of the first move
+            nextBound = candidates after the first move
+    '''
+    def __init__(self, moves, score, depth, ourScore, nextBound):
+        self.moves = moves
+        self.score = score
+        self.depth = depth
+        self.ourScore = ourScore
+        self.nextBound = nextBound
+
+    @property
+    def move(self):
+        return self.moves[0]
 
 
 class GomokuAI():
     # Done
-    def __init__(self, depth=4):
+    def __init__(self, depth=4, lazyShapes=True, shapeCache=None, ttSizeMB=16, timeBudget=None,
+                 workers=1, deterministic=True, zobristSeed=utils.ZOBRIST_SEED, book=None,
+                 symmetricHashing=False):
         self.depth = depth  # default depth set to 3
         self.boardMap = [[0 for j in range(N)] for i in range(N)]
+        self.bitboard = BitBoard()  # occupancy bitmasks, kept in sync with boardMap
         self.move_count = 0  # Add this line to track moves
         self.currentI = -1
         self.currentJ = -1
         self.ourScore = -1
-        self.nextBound = {}  # to store possible moves to be checked (i,j)
+        self.nextBound = MoveCandidates()  # to store possible moves to be checked (i,j)
         self.boardValue = 0
 
         self.turn = 0
         self.lastPlayed = 0
         self.emptyCells = N * N  # Used to detect when the board is full (draw condition)
         self.patternDict = utils.create_pattern_dict()
-        self.zobristTable = utils.init_zobrist()
+        # line shape -> pattern score table (built lazily unless asked otherwise)
+        self.shapeTable = ShapeTable(self.patternDict, lazy=lazyShapes, cache_path=shapeCache)
+        # Ternary code of every board line, updated on each move
+        self.lineCodes = [0] * len(LINES)
+        # Per-line score cache as (code, score) of staticScore, refreshed when the code changed
+        self.lineScores = [(0, 0)] * len(LINES)
+        # Moves made by the search on top of the real position, as (i, j, state)
+        self.searchMoves = []
+        self.zobristSeed = zobristSeed
+        self.zobristTable, self.sideKey = utils.init_zobrist(zobristSeed)
         self.rollingHash = 0
-        self.TTable = {}
+        # Symmetry-aware hashing: keys of the position under the 8 board symmetries,
+        # the minimal one indexes the TT. symmetricZobrist[idx * 2 + side][t] is the
+        # key of a stone on the image of cell idx under symmetry t
+        self.symmetricHashing = symmetricHashing
+        self.symmetricZobrist = [tuple(self.zobristTable[cells[idx] * 2 + side] ^ self.sideKey
+                                       for cells in CELL_MAP)
+                                 for idx in range(N * N) for side in (0, 1)]
+        self.symmetricKeys = [0] * len(TRANSFORMS)
+        self.TTable = TranspositionTable(ttSizeMB)
+
+        # Move ordering: hash move, then killer moves, then history heuristic
+        self.moveOrdering = True
+        self.width = 5  # candidates kept by childNodes at each node (k)
+        # Adaptive width: threat moves always kept (see threatMoves), width shrinking
+        # with the ply down to minWidth, and late move reductions of quiet candidates
+        self.adaptiveWidth = True
+        self.minWidth = MIN_WIDTH
+        self.lateMoveReduction = True
+        self.lineThreats = LineThreats()
+        self.killers = [[None, None] for _ in range(MAX_PLY)]  # 2 cutoff moves per ply
+        self.history = [[0] * (N * N), [0] * (N * N)]  # cutoff scores of AI / human moves
+        self.nodeCount = 0
+        self.evalCount = 0
+        # Best line below each ply of the node being searched (see negamax)
+        self.pvTable = [[] for _ in range(MAX_PLY + 1)]
+        self.variation = None  # PrincipalVariation of the last root search
+
+        # Principal Variation Search: children after the first one get a null window
+        self.pvSearch = True
+
+        # Iterative deepening: seconds per move (None = fixed depth search),
+        # each iteration searched in a window around the previous score (None = full window)
+        self.timeBudget = timeBudget
+        self.aspirationWindow = ASPIRATION
+        self.deadline = None
+        # Cancellation of a background search (threading.Event, see SearchWorker)
+        self.cancelToken = None
+
+        # Parallel root search across a process pool (workers > 1)
+        self.workers = workers
+        self.deterministic = deterministic
+
+        # Threat-space search run by ai_move before the main search
+        self.threatSearch = True
+        self.threatSolver = ThreatSolver()
+
+        # Opening book (file path) queried by ai_move for the first bookPlies stones
+        self.book = OpeningBook(book) if book else None
+        self.bookPlies = 10
+
+        # Search instrumentation (SearchStats), None = disabled
+        self.stats = None
+
+    # Record search statistics on every ai_move (see SearchStats)
+    def enableStats(self, stats=None):
+        self.disableStats()
+        self.stats = stats or SearchStats()
+        self.stats.attach(self)
+        return self.stats
+
+    def disableStats(self):
+        if self.stats is not None:
+            self.stats.detach(self)
+            self.stats = None
+
+    # Replace the pattern dictionary and invalidate the shape table built from it
+    def setPatternDict(self, pattern_dict):
+        self.patternDict = pattern_dict
+        self.shapeTable.invalidate(pattern_dict)
+        self.lineScores = [(-1, 0)] * len(LINES)
 
     # Draw board in string format
     def drawBoard(self):
@@ -57,10 +180,7 @@ class GomokuAI():
         if i < 0 or i >= N or j < 0 or j >= N:
             return False
         if state:
-            if self.boardMap[i][j] != 0:
-                return False
-            else:
-                return True
+            return self.bitboard.isEmpty(i, j)
         else:
             return True
 
@@ -73,52 +193,240 @@ class GomokuAI():
             -1 = human
         '''
         assert state in (-1, 0, 1), 'The state inserted is not -1, 0 or 1'
+        delta = DIGIT[state] - DIGIT[self.boardMap[i][j]]
+        for line, weight in CELL_LINES[i * N + j]:
+            self.lineCodes[line] += delta * weight
         self.boardMap[i][j] = state
+        self.bitboard.set(i, j, state)
         self.lastPlayed = state
 
-    # isFive use it
-    def countDirection(self, i, j, xdir, ydir, state):
-        count = 0
-        # look for 4 more steps on a certain direction
-        for step in range(1, 5):
-            if xdir != 0 and (j + xdir * step < 0 or j + xdir * step >= N):  # ensure move inside the board
-                break
-            if ydir != 0 and (i + ydir * step < 0 or i + ydir * step >= N):
-                break
-            if self.boardMap[i + ydir * step][j + xdir * step] == state:
-                count += 1
-            else:
-                break
-        return count
+    # Play a real move of the game: bound, board value, board and zobrist hash
+    def playMove(self, i, j, state):
+        self.updateBound(i, j, self.nextBound)
+        self.boardValue = self.evaluate(i, j, self.boardValue, state, self.nextBound)
+        self.currentI, self.currentJ = i, j
+        self.setState(i, j, state)
+        self.updateHash(i, j, state)
+        self.emptyCells -= 1
+
+    # XOR a stone of `state` on (i, j) and the side to move into the hash (also undoes it)
+    def updateHash(self, i, j, state):
+        self.rollingHash ^= self.zobristTable[(i * N + j) * 2 + (state != 1)] ^ self.sideKey
+        if self.symmetricHashing:
+            self.symmetricKeys = [key ^ delta for key, delta in
+                                  zip(self.symmetricKeys, self.symmetricZobrist[(i * N + j) * 2 + (state != 1)])]
+
+    # Hash of the current board computed from scratch (also resets the symmetric keys)
+    def computeHash(self):
+        key = 0
+        keys = [0] * len(TRANSFORMS)
+        for state in (1, -1):
+            for i, j in self.bitboard.stones(state):
+                key ^= self.zobristTable[(i * N + j) * 2 + (state != 1)] ^ self.sideKey
+                if self.symmetricHashing:
+                    keys = [old ^ delta for old, delta in
+                            zip(keys, self.symmetricZobrist[(i * N + j) * 2 + (state != 1)])]
+        self.symmetricKeys = keys
+        return key
+
+    # Turn symmetry-aware hashing on or off during a game
+    def setSymmetricHashing(self, enabled):
+        self.symmetricHashing = enabled
+        self.rollingHash = self.computeHash()
+
+    # TT key of the position and the symmetry t it is seen through
+    def searchKey(self):
+        '''
+            Without symmetric hashing: (rollingHash, 0). Otherwise the minimal
+            of the 8 symmetric keys, so rotated and reflected positions share
+            their TT entries. Moves stored under the key are in the
+            orientation of t: map them with transform_move(t, ...) to store
+            and transform_move(INVERSE[t], ...) after a probe. The stored
+            score is only used when the entry was stored with the same t.
+        '''
+        if not self.symmetricHashing:
+            return self.rollingHash, 0
+        return canonical(self.symmetricKeys)
+
+    # Picklable snapshot of the game state, used to rebuild the engine in another process
+    def getState(self):
+        return {
+            'boardMap': [row[:] for row in self.boardMap],
+            'nextBound': dict(self.nextBound),
+            'boardValue': self.boardValue,
+            'depth': self.depth,
+            'currentI': self.currentI,
+            'currentJ': self.currentJ,
+            'turn': self.turn,
+            'lastPlayed': self.lastPlayed,
+            'emptyCells': self.emptyCells,
+            'move_count': self.move_count,
+            'last_distant_check': getattr(self, '_last_distant_check', None),
+            'symmetricHashing': self.symmetricHashing,
+        }
+
+    def loadState(self, state):
+        for i in range(N):
+            for j in range(N):
+                if self.boardMap[i][j] != state['boardMap'][i][j]:
+                    self.setState(i, j, state['boardMap'][i][j])
+        self.symmetricHashing = state['symmetricHashing']
+        self.rollingHash = self.computeHash()
+        self.nextBound = MoveCandidates(state['nextBound'])
+        self.boardValue = state['boardValue']
+        self.depth = state['depth']
+        self.currentI, self.currentJ = state['currentI'], state['currentJ']
+        self.turn = state['turn']
+        self.lastPlayed = state['lastPlayed']
+        self.emptyCells = state['emptyCells']
+        self.move_count = state['move_count']
+        if state['last_distant_check'] is not None:
+            self._last_distant_check = state['last_distant_check']
+        elif hasattr(self, '_last_distant_check'):
+            del self._last_distant_check
+
+    # Make/unmake a move during the search (board, bitboard, line codes and zobrist hash)
+    def makeMove(self, i, j, state):
+        idx = i * N + j
+        digit = DIGIT[state]
+        lineCodes = self.lineCodes
+        for line, weight in CELL_LINES[idx]:
+            lineCodes[line] += digit * weight
+        self.searchMoves.append((i, j, state))
+        self.boardMap[i][j] = state
+        self.bitboard.toggle(idx, state)
+        self.rollingHash ^= self.zobristTable[idx * 2 + (state != 1)] ^ self.sideKey
+        if self.symmetricHashing:
+            self.symmetricKeys = [key ^ delta for key, delta in
+                                  zip(self.symmetricKeys, self.symmetricZobrist[idx * 2 + (state != 1)])]
+
+    def undoMove(self, i, j, state):
+        idx = i * N + j
+        digit = DIGIT[state]
+        lineCodes = self.lineCodes
+        self.searchMoves.pop()
+        for line, weight in CELL_LINES[idx]:
+            lineCodes[line] -= digit * weight
+        self.boardMap[i][j] = 0
+        self.bitboard.toggle(idx, state)
+        self.rollingHash ^= self.zobristTable[idx * 2 + (state != 1)] ^ self.sideKey
+        if self.symmetricHashing:
+            self.symmetricKeys = [key ^ delta for key, delta in
+                                  zip(self.symmetricKeys, self.symmetricZobrist[idx * 2 + (state != 1)])]
+
+    # Pattern score of the whole lines of the board, from the per-line cache
+    def staticScore(self):
+        '''
+            Every pattern occurrence of every board line is counted. This is
+            not boardValue: evaluate, like countPattern, only scores the
+            windows within its clipped steps of each move (none along row 0
+            or column 0), so boardValue depends on the moves played.
+        '''
+        lineCodes = self.lineCodes
+        lineScores = self.lineScores
+        total = 0
+        for line in range(len(LINES)):
+            code = lineCodes[line]
+            cached = lineScores[line]
+            if cached[0] != code:
+                cached = (code, self.shapeTable.lineScore(LINE_LENGTHS[line], code))
+                lineScores[line] = cached
+            total += cached[1]
+        return total
 
     # Check whether there are 5 pieces connected (in all 4 directions)
     def isFive(self, i, j, state):
-        # 4 directions: horizontal, vertical, 2 diagonals
-        directions = [[(-1, 0), (1, 0)],  # Horizontal axis
-                      [(0, -1), (0, 1)],  # Vertical axis
-                      [(-1, 1), (1, -1)],  # Diagonal (top-right to bottom-left)
-                      [(-1, -1), (1, 1)]]  # Diagonal (top-left to bottom-right)
-        for axis in directions:
-            axis_count = 1
-            for (xdir, ydir) in axis:
-                axis_count += self.countDirection(i, j, xdir, ydir, state)
-                if axis_count >= 5:
-                    return True
-        return False
-
-    def childNodes(self, bound, k=5):  # Increased k to consider more moves
-        """Select top moves by absolute score value"""
-        # Get all empty positions with their absolute scores
-        valid_moves = [(pos, abs(score)) for pos, score in bound.items()
-                       if self.isPositionEmpty(*pos)]
-
-        # Sort by score descending, then by position (for consistency)
-        valid_moves.sort(key=lambda x: (-x[1], x[0]))
+        # Bitboard test of the 5-cell windows through (i,j) in the 4 directions
+        if state not in (-1, 1) or not self.isValid(i, j, False):
+            return False
+        return self.bitboard.isFive(i, j, state)
+
+    def childNodes(self, bound, k=5, hashMove=None, ply=None, state=1, threats=0, forced=False):
+        """
+            Select top moves by absolute score value, plus the threat cells
+            (mask, see threatMoves). Forced threat cells are the only moves.
+            With move ordering (ply given), the selected moves are tried in
+            this order: transposition table move, killer moves of the ply,
+            history heuristic score, then absolute score.
+        """
+        if forced:
+            moves = [to_move(cell) for cell in bits(threats)]
+        else:
+            # Get all empty positions with their absolute scores
+            valid_moves = [(pos, abs(score)) for pos, score in bound.items()
+                           if self.isPositionEmpty(*pos)]
+
+            # Sort by score descending, then by position (for consistency)
+            valid_moves.sort(key=lambda x: (-x[1], x[0]))
+            moves = [pos for pos, _ in valid_moves[:k]]
+            # Open three cells are kept even out of the top k
+            for cell in bits(threats):
+                pos = to_move(cell)
+                if pos not in moves:
+                    moves.append(pos)
+
+        if self.moveOrdering and ply is not None:
+            # The hash move is tried even if it fell out of the top k
+            if hashMove is not None and not forced and hashMove not in moves \
+                    and hashMove in bound and self.isPositionEmpty(*hashMove):
+                moves.append(hashMove)
+            killers = self.killers[ply]
+            history = self.history[0 if state == 1 else 1]
+            # Stable sort: ties keep the absolute score order
+            moves.sort(key=lambda pos: (pos != hashMove, pos not in killers,
+                                        -history[pos[0] * N + pos[1]]))
 
         # Yield top k moves
-        for pos, _ in valid_moves[:k]:
+        for pos in moves:
             yield pos
 
+    # Candidates kept at a ply: width at the root, one less every 2 plies
+    def widthAt(self, ply):
+        if not self.adaptiveWidth:
+            return self.width
+        return max(self.minWidth, self.width - ply // 2)
+
+    def threatMoves(self, state):
+        '''
+            Threat cells of the side to move (state) as (mask, forced):
+                a cell completing five          -> forced, the only move
+                the cells blocking a four       -> forced, the only moves
+                the cells of the open threes    -> kept on top of the width
+            Open three cells of both sides are kept: blocking the opponent's,
+            or turning one's own into an open four.
+        '''
+        if not self.adaptiveWidth:
+            return 0, False
+        ai_fives, human_fives, ai_threes, human_threes = self.lineThreats.masks(self.lineCodes)
+        if state == 1:
+            wins, blocks = ai_fives, human_fives
+        else:
+            wins, blocks = human_fives, ai_fives
+        if wins:
+            return wins & -wins, True
+        if blocks:
+            return blocks, True
+        return ai_threes | human_threes, False
+
+    # Remember a move that caused a beta cutoff
+    def storeCutoff(self, i, j, state, depth, ply):
+        killers = self.killers[ply]
+        if killers[0] != (i, j):
+            killers[1] = killers[0]
+            killers[0] = (i, j)
+        self.history[0 if state == 1 else 1][i * N + j] += depth * depth
+
+    # Reset the per-search counters and heuristics before a new ai_move
+    def newSearch(self):
+        self.nodeCount = 0
+        self.evalCount = 0
+        self.variation = None
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        # Age the history so old cutoffs weigh less than the new ones
+        for table in self.history:
+            for idx in range(N * N):
+                table[idx] >>= 1
+
     def updateBound(self, new_i, new_j, bound):
         # Step 1: Remove the played move
         played = (new_i, new_j)
@@ -143,19 +451,15 @@ class GomokuAI():
                 self.move_count - self._last_distant_check < 3:
             return
 
-        human_stones = [(i, j) for i in range(N) for j in range(N)
-                        if self.boardMap[i][j] == -1]
-        ai_stones = [(i, j) for i in range(N) for j in range(N)
-                     if self.boardMap[i][j] == 1]
-
-        distant_groups = []
-        for hi, hj in human_stones:
-            if all(abs(hi - ai) + abs(hj - aj) > 3 for ai, aj in ai_stones):
-                distant_groups.append((hi, hj))
+        # Human stones with no AI stone within Manhattan distance 3 (kept by the bitboard)
+        distant = self.bitboard.distantHuman()
 
         # Only proceed if human has ≥2 stones in a distant zone
-        if len(distant_groups) >= 2:
-            for hi, hj in distant_groups[:2]:  # Track max 2 zones
+        if distant & (distant - 1):
+            for _ in range(2):  # Track max 2 zones (the first ones in row-major order)
+                low = distant & -distant
+                distant ^= low
+                hi, hj = divmod(low.bit_length() - 1, N)
                 for di, dj in directions:
                     ni, nj = hi + di, hj + dj
                     if self.isValid(ni, nj) and (ni, nj) not in bound:
@@ -221,7 +525,39 @@ class GomokuAI():
             board_value = value of the board updated at each minimax and initialized as 0
             turn = [1, -1] AI or human turn
             bound = dict of empty playable cells with corresponding score
+            Same result as evaluatePatterns, with one shape table lookup
+            per direction before and after the move
         '''
+        self.evalCount += 1
+        value_before = 0
+        value_after = 0
+        lineCodes = self.lineCodes
+        lookup = self.shapeTable.lookup
+        base = (new_i * N + new_j) * 4
+
+        for d in range(4):
+            positions, center, line, start = SEGMENTS[base + d]
+            length = len(positions)
+            # Cut the segment code out of the cached line code
+            code = lineCodes[line] // POW3[start] % POW3[length]
+
+            score, marks = lookup(length, code)
+            value_before += score
+            for idx, mark in marks:
+                pos = positions[idx]
+                bound[pos] = bound.get(pos, 0) - mark
+
+            # Make the move on the line code only, the board is left untouched
+            score, marks = lookup(length, code + DIGIT[turn] * POW3[center])
+            value_after += score
+            for idx, mark in marks:
+                pos = positions[idx]
+                bound[pos] = bound.get(pos, 0) + mark
+
+        return board_value + value_after - value_before
+
+    # Reference implementation of evaluate: one countPattern scan per pattern
+    def evaluatePatterns(self, new_i, new_j, board_value, turn, bound):
         value_before = 0
         value_after = 0
 
@@ -240,107 +576,436 @@ class GomokuAI():
 
         return board_value + value_after - value_before
 
-    ### MiniMax algorithm with AlphaBeta Pruning ###
-    def alphaBetaPruning(self, depth, board_value, bound, alpha, beta, maximizingPlayer):
+    ### Search: negamax with AlphaBeta Pruning ###
+    def searchRoot(self, depth, board_value, bound, alpha=-math.inf, beta=math.inf):
+        '''
+            Root of the search (ply 0), with the AI to move (depth is
+            normally self.depth).
+            Every candidate is searched by negamax. Returns the
+            PrincipalVariation of the best move, also left in currentI,
+            currentJ, ourScore, boardValue and nextBound, or None if no move
+            was searched.
+        '''
+        self.nodeCount += 1
+        if depth <= 0 or self.isTerminal():
+            return None
+
+        # The search applies and undoes the moves on bound in place
+        if not isinstance(bound, MoveCandidates):
+            bound = MoveCandidates(bound)
+        bound.commit()
 
-        if depth <= 0 or (self.checkResult() != None):
-            return board_value  # Static evaluation
+        # The root always searches: the TT only gives the first move to try
+        alpha_orig = alpha
+        key, sym = self.searchKey()
+        entry = self.TTable.probe(key)
+        hash_move = entry[3] if entry is not None else None
+        if hash_move is not None and sym:
+            hash_move = transform_move(INVERSE[sym], *hash_move)
 
-        # Transposition table of the format {hash: [score, depth]}
-        if self.rollingHash in self.TTable and self.TTable[self.rollingHash][1] >= depth:
-            return self.TTable[self.rollingHash][0]  # return board value stored in TTable
+        ply = 0
+        pvTable = self.pvTable
+        best = None
+        best_val = -math.inf
+        threats, forced = self.threatMoves(1)
+        for i, j in self.childNodes(bound, self.widthAt(ply), hash_move, ply, 1, threats, forced):
+            score = bound.get((i, j), 0)
+            mark = bound.mark()
+            new_val = self.evaluate(i, j, board_value, 1, bound)
+            self.makeMove(i, j, 1)
+            self.updateBound(i, j, bound)
+            try:
+                eval = self.searchChild(depth, new_val, bound, alpha, beta, -1, ply + 1, best is None)
+                if eval > best_val:
+                    best_val = eval
+                    best = PrincipalVariation([(i, j)] + pvTable[ply + 1], eval, depth,
+                                              score, bound.snapshot())
+            finally:
+                self.undoMove(i, j, 1)
+                bound.undo(mark)
+            alpha = max(alpha, eval)
+
+            if beta <= alpha:  # prune
+                self.storeCutoff(i, j, 1, depth, ply)
+                break
+
+        if best is None:
+            return None
+        if best_val <= alpha_orig:
+            flag = UPPER
+        elif best_val >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.TTable.store(key, best_val, depth, flag,
+                          transform_move(sym, *best.move) if sym else best.move, sym)
+        self.setVariation(best)
+        return best
+
+    def negamax(self, depth, board_value, bound, alpha, beta, color, ply):
+        '''
+            Value of the position for the side to move, color = 1 (AI) or -1
+            (human). board_value is the static value for the AI, and the TT
+            stores the values for the side to move.
+            ply = distance to the root, given by the parent since the reduced
+            searches make it differ from self.depth - depth.
+            The best line found is left in pvTable[ply].
+        '''
+        self.nodeCount += 1
+        if not self.nodeCount & TIME_CHECK and (
+                (self.deadline is not None and time.time() > self.deadline)
+                or (self.cancelToken is not None and self.cancelToken.is_set())):
+            raise SearchTimeout()
+
+        pvTable = self.pvTable
+        pvTable[ply] = []
+        if depth <= 0 or self.isTerminal():
+            return color * board_value  # Static evaluation (a five is scored by its pattern)
+
+        # Transposition table entry: (score, depth, bound type, best move, symmetry).
+        # The evaluation is not invariant under the board symmetries, so an
+        # entry stored in another orientation only gives its hash move
+        alpha_orig = alpha
+        key, sym = self.searchKey()
+        entry = self.TTable.probe(key)
+        hash_move = entry[3] if entry is not None else None
+        if hash_move is not None and sym:
+            hash_move = transform_move(INVERSE[sym], *hash_move)
+        if entry is not None and entry[1] >= depth and entry[4] == sym:
+            tt_score, _, tt_flag, _, _ = entry
+            if tt_flag == EXACT:
+                return tt_score
+            if tt_flag == LOWER:
+                alpha = max(alpha, tt_score)
+            else:
+                beta = min(beta, tt_score)
+            if alpha >= beta:
+                return tt_score
+
+        best_val = -math.inf
+        best_move = None
+        threats, forced = self.threatMoves(color)
+        children = self.childNodes(bound, self.widthAt(ply), hash_move, ply, color, threats, forced)
+        for index, (i, j) in enumerate(children):
+            # Late move reduction of the quiet candidates after the first ones
+            reduce = self.lateMoveReduction and not forced and index >= LMR_MOVES \
+                and abs(bound.get((i, j), 0)) < LMR_SCORE and not threats >> (i * N + j) & 1
+            # Update bound in place (undone below from the journal mark)
+            # and evaluate the position if making the move
+            mark = bound.mark()
+            new_val = self.evaluate(i, j, board_value, color, bound)
+            self.makeMove(i, j, color)
+            self.updateBound(i, j, bound)
+            try:
+                eval = self.searchChild(depth, new_val, bound, alpha, beta, -color, ply + 1,
+                                        best_move is None, reduce)
+            finally:
+                # Undo the move (also when a timeout unwinds the search)
+                self.undoMove(i, j, color)
+                bound.undo(mark)
+            if eval > best_val:
+                best_val = eval
+                best_move = (i, j)
+                pvTable[ply] = [best_move] + pvTable[ply + 1]
+            alpha = max(alpha, eval)
+
+            if beta <= alpha:  # prune
+                self.storeCutoff(i, j, color, depth, ply)
+                break
+
+        # Fail-low is an upper bound, a cutoff a lower bound
+        if best_val <= alpha_orig:
+            flag = UPPER
+        elif best_val >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        if best_move is not None and sym:
+            best_move = transform_move(sym, *best_move)
+        self.TTable.store(key, best_val, depth, flag, best_move, sym)
+        return best_val
+
+    def searchChild(self, depth, board_value, bound, alpha, beta, color, ply, first, reduce=False):
+        '''
+            Value of the child just played for its parent (window alpha, beta
+            of the parent, color = side to move in the child, ply = ply of the
+            child).
+            PVS: the first child gets the full window. The others are only
+            tested against alpha with a null window, and searched again with
+            the full window if they fail high inside (alpha, beta).
+            reduce: the null window test is first made 1 ply shallower, and
+            the move is dropped if it fails low there.
+        '''
+        if reduce and depth > 2:
+            eval = -self.negamax(depth - 2, board_value, bound, -alpha - NULL_WINDOW, -alpha, color, ply)
+            if eval <= alpha:
+                return eval
+        if first or not self.pvSearch or depth <= 1 or beta - alpha <= NULL_WINDOW:
+            return -self.negamax(depth - 1, board_value, bound, -beta, -alpha, color, ply)
+        eval = -self.negamax(depth - 1, board_value, bound, -alpha - NULL_WINDOW, -alpha, color, ply)
+        if alpha < eval < beta:
+            # eval is a lower bound of the value: search again above it
+            eval = -self.negamax(depth - 1, board_value, bound, -beta, -(eval - NULL_WINDOW), color, ply)
+        return eval
+
+    # Root search in a window around guess (the score of the previous iteration)
+    def aspirationSearch(self, depth, board_value, bound, guess):
+        '''
+            A result outside the window is only a bound: the side it failed
+            on is opened to infinity and the root searched again.
+        '''
+        alpha, beta = guess - self.aspirationWindow, guess + self.aspirationWindow
+        while True:
+            pv = self.searchRoot(depth, board_value, bound, alpha, beta)
+            if pv is None:
+                return None
+            if pv.score <= alpha:
+                alpha = -math.inf
+            elif pv.score >= beta:
+                beta = math.inf
+            else:
+                return pv
+
+    # Leave the result of a root search in currentI, currentJ, ourScore, boardValue and nextBound
+    def setVariation(self, pv):
+        self.variation = pv
+        self.currentI, self.currentJ = pv.move
+        self.ourScore = pv.ourScore
+        self.boardValue = pv.score
+        self.nextBound = pv.nextBound
+
+    # Search depth 1, 2, ... maxDepth until the time budget (seconds) runs out
+    def iterativeDeepening(self, maxDepth, timeBudget, search=None):
+        '''
+            Every iteration starts from the same board value and bound, and
+            reuses the transposition table of the previous ones for move
+            ordering. After depth 1, iterations are aspiration searches
+            around the previous score. search(depth, board_value, bound)
+            replaces the root search of every iteration (parallel_search):
+            it returns a PrincipalVariation and stops at self.deadline.
+            Returns the depth of the last completed iteration, whose
+            variation is left in currentI, currentJ, ourScore, boardValue and
+            nextBound (see setVariation). Depth 1 is always completed.
+        '''
+        board_value, bound = self.boardValue, self.nextBound
+        deadline = time.time() + timeBudget
+        completed = 0
+        best = None
+        try:
+            for depth in range(1, maxDepth + 1):
+                self.depth = depth
+                self.deadline = deadline if depth > 1 else None
+                try:
+                    if search is not None:
+                        pv = search(depth, board_value, bound)
+                    elif best is None or not self.aspirationWindow:
+                        pv = self.searchRoot(depth, board_value, bound)
+                    else:
+                        pv = self.aspirationSearch(depth, board_value, bound, best.score)
+                except SearchTimeout:
+                    break
+                completed = depth
+                best = pv or best
+                if time.time() > deadline:
+                    break
+        finally:
+            self.depth = maxDepth
+            self.deadline = None
+
+        if best is not None:
+            self.setVariation(best)
+        return completed
+
+    # Reference implementation of the search: minimax with separate max/min halves,
+    # the root fields set in place. Kept to verify searchRoot (benchmark.py --verify),
+    # on the same candidates but without late move reductions;
+    # it stores scores for the AI in the TT, so it needs a cleared TT
+    def minimax(self, depth, board_value, bound, alpha, beta, maximizingPlayer):
+        self.nodeCount += 1
+        if not self.nodeCount & TIME_CHECK and (
+                (self.deadline is not None and time.time() > self.deadline)
+                or (self.cancelToken is not None and self.cancelToken.is_set())):
+            raise SearchTimeout()
+
+        if depth <= 0 or self.isTerminal():
+            return board_value  # Static evaluation (a five is scored by its pattern)
+
+        # The search applies and undoes the moves on bound in place
+        if depth == self.depth:
+            if not isinstance(bound, MoveCandidates):
+                bound = MoveCandidates(bound)
+            bound.commit()
+
+        # Transposition table entry: (score, depth, bound type, best move, symmetry)
+        # The root always searches, since it has to set the move to play
+        alpha_orig, beta_orig = alpha, beta
+        key, sym = self.searchKey()
+        entry = self.TTable.probe(key)
+        hash_move = entry[3] if entry is not None else None
+        if hash_move is not None and sym:
+            hash_move = transform_move(INVERSE[sym], *hash_move)
+        if entry is not None and entry[1] >= depth and depth != self.depth and entry[4] == sym:
+            tt_score, _, tt_flag, _, _ = entry
+            if tt_flag == EXACT:
+                return tt_score
+            if tt_flag == LOWER:
+                alpha = max(alpha, tt_score)
+            else:
+                beta = min(beta, tt_score)
+            if alpha >= beta:
+                return tt_score
+
+        ply = self.depth - depth
 
         # AI is the maximizing player
         if maximizingPlayer:
             # Initializing max value
             max_val = -math.inf
+            best_move = None
             # Look through the all possible child nodes
-            for child in self.childNodes(bound):
+            threats, forced = self.threatMoves(1)
+            for child in self.childNodes(bound, self.widthAt(ply), hash_move, ply, 1, threats, forced):
                 i, j = child[0], child[1]
-                # Create a new bound with updated values
+                score = bound.get((i, j), 0)
+                # Update bound in place (undone below from the journal mark)
                 # and evaluate the position if making the move
-                new_bound = dict(bound)
-                new_val = self.evaluate(i, j, board_value, 1, new_bound)
+                mark = bound.mark()
+                new_val = self.evaluate(i, j, board_value, 1, bound)
 
                 # Make the move and update zobrist hash
-                self.boardMap[i][j] = 1
-                self.rollingHash ^= self.zobristTable[i][j][0]  # index 0 for AI moves
+                self.makeMove(i, j, 1)
 
                 # Update bound based on the new move (i,j)
-                self.updateBound(i, j, new_bound)
-
-                # Evaluate position going now at depth-1 and it's the opponent's turn
-                eval = self.alphaBetaPruning(depth - 1, new_val, new_bound, alpha, beta, False)
-                if eval > max_val:
-                    max_val = eval
-                    if depth == self.depth:
-                        self.currentI = i
-                        self.ourScore = bound[(i, j)]
-                        self.currentJ = j
-                        self.boardValue = eval
-                        self.nextBound = new_bound
-                alpha = max(alpha, eval)
+                self.updateBound(i, j, bound)
 
-                # Undo the move and update again zobrist hashing
-                self.boardMap[i][j] = 0
-                self.rollingHash ^= self.zobristTable[i][j][0]
+                try:
+                    # Evaluate position going now at depth-1 and it's the opponent's turn
+                    eval = self.minimax(depth - 1, new_val, bound, alpha, beta, False)
+                    if eval > max_val:
+                        max_val = eval
+                        best_move = (i, j)
+                        if depth == self.depth:
+                            self.currentI = i
+                            self.ourScore = score
+                            self.currentJ = j
+                            self.boardValue = eval
+                            self.nextBound = bound.snapshot()
+                finally:
+                    # Undo the move and update again zobrist hashing
+                    # (also when a timeout unwinds the search)
+                    self.undoMove(i, j, 1)
+                    bound.undo(mark)
+                alpha = max(alpha, eval)
 
-                del new_bound
                 if beta <= alpha:  # prune
+                    self.storeCutoff(i, j, 1, depth, ply)
                     break
 
-            # Update Transposition Table
-            utils.update_TTable(self.TTable, self.rollingHash, max_val, depth)
-            # print(max_val)
+            # Update Transposition Table (fail-low is an upper bound, cutoff a lower bound)
+            if max_val <= alpha_orig:
+                flag = UPPER
+            elif max_val >= beta:
+                flag = LOWER
+            else:
+                flag = EXACT
+            if best_move is not None and sym:
+                best_move = transform_move(sym, *best_move)
+            self.TTable.store(key, max_val, depth, flag, best_move, sym)
             return max_val
 
         else:
             # Initializing min value
             min_val = math.inf
+            best_move = None
             # Look through the all possible child nodes
-            for child in self.childNodes(bound):
+            threats, forced = self.threatMoves(-1)
+            for child in self.childNodes(bound, self.widthAt(ply), hash_move, ply, -1, threats, forced):
                 i, j = child[0], child[1]
-                # Create a new bound with updated values
+                score = bound.get((i, j), 0)
+                # Update bound in place (undone below from the journal mark)
                 # and evaluate the position if making the move
-                new_bound = dict(bound)
-                new_val = self.evaluate(i, j, board_value, -1, new_bound)
+                mark = bound.mark()
+                new_val = self.evaluate(i, j, board_value, -1, bound)
 
                 # Make the move and update zobrist hash
-                self.boardMap[i][j] = -1
-                self.rollingHash ^= self.zobristTable[i][j][1]  # index 1 for human moves
+                self.makeMove(i, j, -1)
 
                 # Update bound based on the new move (i,j)
-                self.updateBound(i, j, new_bound)
-
-                # Evaluate position going now at depth-1 and it's the opponent's turn
-                eval = self.alphaBetaPruning(depth - 1, new_val, new_bound, alpha, beta, True)
-                if eval < min_val:
-                    min_val = eval
-                    if depth == self.depth:
-                        self.currentI = i
-                        self.currentJ = j
-                        self.ourScore = bound[(i, j)]
-                        self.boardValue = eval
-                        self.nextBound = new_bound
-                beta = min(beta, eval)
+                self.updateBound(i, j, bound)
 
-                # Undo the move and update again zobrist hashing
-                self.boardMap[i][j] = 0
-                self.rollingHash ^= self.zobristTable[i][j][1]
+                try:
+                    # Evaluate position going now at depth-1 and it's the opponent's turn
+                    eval = self.minimax(depth - 1, new_val, bound, alpha, beta, True)
+                    if eval < min_val:
+                        min_val = eval
+                        best_move = (i, j)
+                        if depth == self.depth:
+                            self.currentI = i
+                            self.currentJ = j
+                            self.ourScore = score
+                            self.boardValue = eval
+                            self.nextBound = bound.snapshot()
+                finally:
+                    # Undo the move and update again zobrist hashing
+                    # (also when a timeout unwinds the search)
+                    self.undoMove(i, j, -1)
+                    bound.undo(mark)
+                beta = min(beta, eval)
 
-                del new_bound
                 if beta <= alpha:  # prune
+                    self.storeCutoff(i, j, -1, depth, ply)
                     break
 
-            # Update Transposition Table
-            utils.update_TTable(self.TTable, self.rollingHash, min_val, depth)
+            # Update Transposition Table (fail-high is a lower bound, cutoff an upper bound)
+            if min_val >= beta_orig:
+                flag = LOWER
+            elif min_val <= alpha:
+                flag = UPPER
+            else:
+                flag = EXACT
+            if best_move is not None and sym:
+                best_move = transform_move(sym, *best_move)
+            self.TTable.store(key, min_val, depth, flag, best_move, sym)
 
             return min_val
 
+    # Winning threat sequence [(i, j), ...] for the AI, or None
+    def findForcedWin(self):
+        return self.threatSolver.solve(self.bitboard.ai, self.bitboard.human)
+
+    # Set (i,j) as the chosen move without searching, as the root of the search does
+    def setRootMove(self, i, j):
+        bound = MoveCandidates(self.nextBound)
+        self.ourScore = bound.get((i, j), 0)
+        self.boardValue = self.evaluate(i, j, self.boardValue, 1, bound)
+        self.makeMove(i, j, 1)
+        self.updateBound(i, j, bound)
+        self.undoMove(i, j, 1)
+        self.currentI, self.currentJ = i, j
+        self.nextBound = bound
+
+    # Book move of the current position, or None (no book / out of book)
+    def bookMove(self):
+        if self.book is None or N * N - self.emptyCells >= self.bookPlies:
+            return None
+        return self.book.probe(self)
+
     def firstMove(self):
-        self.currentI, self.currentJ = 7, 7
+        self.currentI, self.currentJ = self.bookMove() or (7, 7)
         self.setState(self.currentI, self.currentJ, 1)
 
+    # Whether the game is over at the current search node
+    def isTerminal(self):
+        '''
+            Five through the last move made by the search (bitboard test), or
+            a full board. At the root, the result of the last real move.
+        '''
+        moves = self.searchMoves
+        if not moves:
+            return self.checkResult() is not None
+        i, j, state = moves[-1]
+        return self.bitboard.isFive(i, j, state) or self.emptyCells <= len(moves)
+
     def checkResult(self):
         if self.isFive(self.currentI, self.currentJ, self.lastPlayed) \
                 and self.lastPlayed in (-1, 1):
@@ -362,4 +1027,4 @@ class GomokuAI():
 
     def isPositionEmpty(self, i, j):
         """Check if position is empty and within bounds"""
-        return 0 <= i < N and 0 <= j < N and self.boardMap[i][j] == 0   
\ No newline at end of file
+        return 0 <= i < N and 0 <= j < N and self.bitboard.isEmpty(i, j)   
\ No newline at end of file
@@ -0,0 +1,130 @@
+from source.utils import N
+
+DISTANT = 3  # Manhattan distance beyond which a human stone is far from every AI stone
+
+# The 4 line directions as (di, dj): vertical, horizontal and the 2 diagonals
+DIRECTIONS = [(1, 0), (0, 1), (1, 1), (-1, 1)]
+
+
+# Number of set bits (int.bit_count only exists from Python 3.10)
+if hasattr(int, 'bit_count'):
+    popcount = int.bit_count
+else:
+    def popcount(mask):
+        return bin(mask).count('1')
+
+
+##### Precomputed masks #####
+# Bit index of cell (i, j) is i * N + j (row-major order)
+def create_five_masks():
+    '''
+        FIVE_MASKS[idx] = masks of every 5-cell window (in all 4 directions)
+        that contains cell idx. A player has five in a row through idx iff
+        one of these windows is fully occupied by his stones.
+    '''
+    five_masks = [[] for _ in range(N * N)]
+    for di, dj in DIRECTIONS:
+        for i in range(N):
+            for j in range(N):
+                end_i, end_j = i + 4 * di, j + 4 * dj
+                if not (0 <= end_i < N and 0 <= end_j < N):
+                    continue
+                cells = [(i + step * di) * N + (j + step * dj) for step in range(5)]
+                mask = 0
+                for idx in cells:
+                    mask |= 1 << idx
+                for idx in cells:
+                    five_masks[idx].append(mask)
+    return five_masks
+
+
+def create_neighbourhoods(radius=DISTANT):
+    '''NEIGHBOURHOODS[idx] = cells within Manhattan distance radius of cell idx'''
+    neighbourhoods = []
+    for i in range(N):
+        for j in range(N):
+            neighbourhoods.append([ni * N + nj
+                                   for ni in range(max(0, i - radius), min(N, i + radius + 1))
+                                   for nj in range(max(0, j - radius), min(N, j + radius + 1))
+                                   if abs(ni - i) + abs(nj - j) <= radius])
+    return neighbourhoods
+
+
+FIVE_MASKS = create_five_masks()
+NEIGHBOURHOODS = create_neighbourhoods()
+
+
+class BitBoard():
+    '''
+        Board occupancy stored as one integer bitmask per player:
+            ai    = cells with state 1
+            human = cells with state -1
+        Empty cells are the ones set in neither mask.
+        Spatial index of the AI stones, updated with them:
+            aiNear[idx] = AI stones within DISTANT of cell idx
+            aiCover     = mask of the cells with aiNear > 0
+    '''
+    def __init__(self):
+        self.ai = 0
+        self.human = 0
+        self.aiNear = [0] * (N * N)
+        self.aiCover = 0
+
+    # Given a position, change the state (0 clears the cell)
+    def set(self, i, j, state):
+        idx = i * N + j
+        bit = 1 << idx
+        was_ai = self.ai & bit
+        self.ai &= ~bit
+        self.human &= ~bit
+        if state == 1:
+            self.ai |= bit
+        elif state == -1:
+            self.human |= bit
+        if was_ai and state != 1:
+            self._near(idx, -1)
+        elif state == 1 and not was_ai:
+            self._near(idx, 1)
+
+    # Make/unmake a move on an empty cell: a single XOR on the player's mask
+    def toggle(self, idx, state):
+        if state == 1:
+            self.ai ^= 1 << idx
+            self._near(idx, 1 if self.ai >> idx & 1 else -1)
+        else:
+            self.human ^= 1 << idx
+
+    def _near(self, idx, delta):
+        near = self.aiNear
+        for cell in NEIGHBOURHOODS[idx]:
+            count = near[cell]
+            if count == 0 or count + delta == 0:
+                self.aiCover ^= 1 << cell
+            near[cell] = count + delta
+
+    # Mask of the human stones farther than DISTANT from every AI stone
+    def distantHuman(self):
+        return self.human & ~self.aiCover
+
+    def isEmpty(self, i, j):
+        return not ((self.ai | self.human) >> (i * N + j) & 1)
+
+    # Whether a stone of `state` on (i, j) is part of 5 (or more) in a row
+    def isFive(self, i, j, state):
+        idx = i * N + j
+        stones = (self.ai if state == 1 else self.human) | (1 << idx)
+        for mask in FIVE_MASKS[idx]:
+            if stones & mask == mask:
+                return True
+        return False
+
+    # List the (i, j) positions of a player's stones in row-major order
+    def stones(self, state):
+        mask = self.ai if state == 1 else self.human
+        positions = []
+        while mask:
+            low = mask & -mask
+            idx = low.bit_length() - 1
+            positions.append(divmod(idx, N))
+            mask ^= low
+        return positions
@@ -0,0 +1,106 @@
+import mmap
+import os
+import struct
+from source.symmetry import CELL_MAP, INVERSE, symmetric_hashes, canonical
+from source.utils import N
+
+##### Opening book file #####
+# Header, then fixed-size records sorted by key:
+#   key   = canonical Zobrist hash of the position, with the side to move
+#           as the AI (minimum over the 8 board symmetries)
+#   move  = i * N + j of the book move, in the canonical orientation
+#   score = weight of the move (the highest weight is played)
+# Several records (moves) can share a key.
+HEADER = struct.Struct('<4sIQ')  # magic, version, zobrist seed
+RECORD = struct.Struct('<QHh')  # key, move, score
+MAGIC = b'GBK1'
+VERSION = 1
+MAX_SCORE = (1 << 15) - 1
+
+
+def position_key(zobristTable, sideKey, mine, theirs):
+    '''(canonical key, symmetry) of a position, `mine` being the side to move'''
+    return canonical(symmetric_hashes(zobristTable, sideKey, mine, theirs))
+
+
+def write_book(path, entries, seed):
+    '''
+        Write {(key, move): score} to a book file, with move = i * N + j in
+        the canonical orientation of key. Scores are clamped to int16.
+    '''
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, seed))
+        for (key, move), score in sorted(entries.items()):
+            score = max(-MAX_SCORE, min(MAX_SCORE, int(score)))
+            f.write(RECORD.pack(key, move, score))
+
+
+class OpeningBook():
+    '''
+        Read-only opening book, memory-mapped: only the pages touched by the
+        binary search are read from disk.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        if size < HEADER.size:
+            raise ValueError('Not an opening book: ' + path)
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.seed = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError('Not an opening book (or wrong version): ' + path)
+        self.count = (size - HEADER.size) // RECORD.size
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+        self.file.close()
+
+    def __len__(self):
+        return self.count
+
+    def _key(self, index):
+        return RECORD.unpack_from(self.data, HEADER.size + index * RECORD.size)[0]
+
+    # All the (move, score) records of a key
+    def lookup(self, key):
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            if self._key(mid) < key:
+                low = mid + 1
+            else:
+                high = mid
+        records = []
+        while low < self.count:
+            record_key, move, score = RECORD.unpack_from(self.data, HEADER.size + low * RECORD.size)
+            if record_key != key:
+                break
+            records.append((move, score))
+            low += 1
+        return records
+
+    # Book move (i, j) for the AI of a GomokuAI to play, or None
+    def probe(self, ai):
+        '''
+            The book must be built with the zobrist seed of the engine.
+            Moves are mapped back from the canonical orientation, and moves
+            on occupied cells (hash collisions) are ignored.
+        '''
+        if ai.zobristSeed != self.seed:
+            return None
+        if ai.symmetricHashing:
+            # The engine already keeps the 8 symmetric keys up to date
+            key, t = canonical(ai.symmetricKeys)
+        else:
+            key, t = position_key(ai.zobristTable, ai.sideKey,
+                                  ai.bitboard.stones(1), ai.bitboard.stones(-1))
+        best = None
+        for move, score in self.lookup(key):
+            i, j = divmod(CELL_MAP[INVERSE[t]][move], N)
+            if ai.isValid(i, j) and (best is None or score > best[0]):
+                best = (score, (i, j))
+        return best[1] if best else None
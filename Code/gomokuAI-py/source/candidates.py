@@ -0,0 +1,49 @@
+_MISSING = object()  # journal marker for positions that were not in the dict
+
+
+class MoveCandidates(dict):
+    '''
+        Dict of candidate moves {(i, j): score} that records every change in
+        a journal, so the search can apply a move in place and undo it later
+        at a cost proportional to the number of changes:
+            mark = bound.mark()
+            ... evaluate / updateBound on bound ...
+            bound.undo(mark)
+    '''
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.journal = []  # list of (position, previous score or _MISSING)
+
+    def __setitem__(self, pos, score):
+        self.journal.append((pos, dict.get(self, pos, _MISSING)))
+        dict.__setitem__(self, pos, score)
+
+    def __delitem__(self, pos):
+        self.journal.append((pos, dict.__getitem__(self, pos)))
+        dict.__delitem__(self, pos)
+
+    def pop(self, pos, *default):
+        if pos in self:
+            self.journal.append((pos, dict.__getitem__(self, pos)))
+        return dict.pop(self, pos, *default)
+
+    def mark(self):
+        return len(self.journal)
+
+    # Revert every change made after mark
+    def undo(self, mark):
+        journal = self.journal
+        while len(journal) > mark:
+            pos, score = journal.pop()
+            if score is _MISSING:
+                dict.__delitem__(self, pos)
+            else:
+                dict.__setitem__(self, pos, score)
+
+    # Forget the journal: the current content can no longer be undone
+    def commit(self):
+        self.journal.clear()
+
+    # Independent copy of the current candidates, with an empty journal
+    def snapshot(self):
+        return MoveCandidates(self)
@@ -1,25 +1,57 @@
-import math
 import time
-import pygame
 from source.AI import *
-from gui.interface import *
 import source.utils as utils 
+import source.parallel as parallel
 
-pygame.init()
+# pygame is only imported by the interface helpers, so the AI can run headless
 
-def ai_move(ai):
+def _silent(*args):
+    pass
+
+def ai_move(ai, verbose=True):
+    log = print if verbose else _silent
     start_time = time.time()
-    ai.alphaBetaPruning(ai.depth, ai.boardValue, ai.nextBound, -math.inf, math.inf, True)
+    if ai.stats is not None:
+        ai.stats.start(ai)
+    ai.newSearch()
+    # Opening book moves are played without searching
+    book_move = ai.bookMove()
+    # Forced wins (continuous fours) are played without the full-width search
+    forced = ai.findForcedWin() if ai.threatSearch and book_move is None else None
+    if book_move is not None:
+        log('Book move: ', book_move)
+        ai.setRootMove(book_move[0], book_move[1])
+    elif forced is not None:
+        log('Forced win: ', forced)
+        ai.setRootMove(forced[0][0], forced[0][1])
+    elif ai.timeBudget is None:
+        if ai.workers > 1:
+            # Root moves searched across the process pool
+            parallel.parallel_search(ai)
+        else:
+            ai.searchRoot(ai.depth, ai.boardValue, ai.nextBound)
+    else:
+        # Iterative deepening up to ai.depth within the time budget,
+        # every iteration searched across the process pool if workers > 1
+        search = None
+        if ai.workers > 1:
+            def search(depth, board_value, bound):
+                return parallel.parallel_search(ai, board_value=board_value, bound=bound)
+        completed = ai.iterativeDeepening(ai.depth, ai.timeBudget, search)
+        log('Completed depth: ', completed)
     end_time = time.time()
-    print('Finished ab prune in: ', end_time - start_time)
+    log('Finished ab prune in: ', end_time - start_time)
+    log('Transposition table: ', ai.TTable.stats())
+    if ai.variation is not None:
+        log('Principal variation: ', ai.variation.moves, ai.variation.score)
     
     if ai.isValid(ai.currentI, ai.currentJ):
         move_i, move_j = ai.currentI, ai.currentJ
-        print(move_i, move_j)
+        log(move_i, move_j)
         ai.updateBound(move_i, move_j, ai.nextBound)
         
     else:
-        print('Error: i and j not valid. Given: ', ai.currentI, ai.currentJ)
+        log('Error: i and j not valid. Given: ', ai.currentI, ai.currentJ)
         ai.updateBound(ai.currentI, ai.currentJ, ai.nextBound)
         bound_sorted = sorted(ai.nextBound.items(), key=lambda el: el[1], reverse=True)
         pos = bound_sorted[0][0]
@@ -27,10 +59,33 @@ def ai_move(ai):
         move_j = pos[1]
         ai.currentI, ai.currentJ = move_i, move_j
         
-        print(move_i, move_j)
+        log(move_i, move_j)
+
+    if ai.stats is not None:
+        record = ai.stats.finish(ai, (move_i, move_j))
+        log('Search stats: nodes {} cutoffs {} (first move {:.0%}) branching {:.2f} evaluate {} ({:.3f}s)'.format(
+            record['nodes'], record['cutoffs'], record['first_move_cutoff_rate'],
+            record['branching_factor'], record['evaluate']['calls'], record['evaluate']['time']))
     
     return move_i, move_j
 
+# Headless turns, with the same bookkeeping as the pygame loop in play.py
+def ai_turn(ai, verbose=True):
+    if ai.emptyCells == N * N:
+        ai.firstMove()
+        move_i, move_j = ai.currentI, ai.currentJ
+    else:
+        move_i, move_j = ai_move(ai, verbose)
+        ai.setState(move_i, move_j, 1)
+    ai.updateHash(move_i, move_j, 1)
+    ai.emptyCells -= 1
+    return move_i, move_j
+
+def human_turn(ai, move_i, move_j):
+    if ai.isValid(move_i, move_j):
+        ai.playMove(move_i, move_j, -1)
+        return move_i, move_j
+
 def check_human_move(ai, mouse_pos):
     # Human's turn
     human_move = utils.pos_pixel2map(mouse_pos[0], mouse_pos[1])
@@ -47,6 +102,7 @@ def check_human_move(ai, mouse_pos):
 
 
 def check_results(ui, result):
+    import pygame
     if result == 0:
         print("it's a tie!")
         ui.drawResult(tie=True)
@@ -0,0 +1,204 @@
+import math
+import multiprocessing
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from source.AI import GomokuAI, PrincipalVariation, SearchTimeout
+from source.candidates import MoveCandidates
+from source.patterns import pattern_fingerprint
+from source.symmetry import INVERSE, transform_move
+
+##### Parallel root search #####
+# The root candidates of searchRoot are split across a pool of worker
+# processes. Each worker keeps its own warm GomokuAI (transposition table,
+# shape table), rebuilt from the game state sent with every task. The search
+# settings and the pattern dictionary are set once per pool: there is one
+# pool per worker count and configuration.
+# Several searches can share a pool (engines of different games): each one
+# takes a slot of the pool for its shared alpha and its cancel flag, reset at
+# the start of the search and given back once all its tasks are done.
+# The workers stop at the deadline of the engine (ai.deadline), and when the
+# engine's cancelToken is set the search raises its cancel flag.
+
+# GomokuAI search settings copied to the worker engines
+SETTINGS = ('width', 'moveOrdering', 'adaptiveWidth', 'minWidth', 'lateMoveReduction', 'pvSearch')
+SEARCH_SLOTS = 16  # searches running at the same time on one pool
+POLL = 0.05  # seconds between two checks of the cancel token while the workers search
+
+_pools = {}  # {(workers, TT size, settings, patterns fingerprint): (executor, alphas, cancels, free slots)}
+_engine = None  # GomokuAI of the worker process
+_alphas = None  # best root score found so far by the search of each slot
+_cancels = None  # cancel flag of the search of each slot
+
+
+class SlotToken():
+    '''Cancel token of a worker engine (ai.cancelToken), set by the search of the slot'''
+    def __init__(self, slot):
+        self.slot = slot
+
+    def is_set(self):
+        return bool(_cancels[self.slot])
+
+
+def _init_worker(ttSizeMB, alphas, cancels, settings, pattern_dict):
+    global _engine, _alphas, _cancels
+    _engine = GomokuAI(ttSizeMB=ttSizeMB)
+    for name, value in settings:
+        setattr(_engine, name, value)
+    if pattern_dict != _engine.patternDict:
+        _engine.setPatternDict(pattern_dict)
+    _alphas = alphas
+    _cancels = cancels
+
+
+def _search_move(state, move, deterministic, slot, deadline):
+    '''
+        Search one root move in the worker process, for the search of slot.
+        Returns (move, eval, exact, ourScore, nextBound, nodes, move_count,
+        last_distant_check, line), where exact is False when eval is only an
+        upper bound (fail-low against the shared alpha) and line is the best
+        line after the move, or None if the search stopped at the deadline
+        or was cancelled.
+    '''
+    ai = _engine
+    ai.loadState(state)
+    ai.newSearch()
+    if deterministic:
+        # Same result whatever the scheduling: no state from previous tasks
+        ai.TTable.clear()
+        ai.history = [[0] * len(table) for table in ai.history]
+        alpha = -math.inf
+    else:
+        alpha = _alphas[slot]
+
+    i, j = move
+    bound = ai.nextBound
+    score = bound.get((i, j), 0)
+    new_val = ai.evaluate(i, j, ai.boardValue, 1, bound)
+    ai.makeMove(i, j, 1)
+    ai.updateBound(i, j, bound)
+    next_bound = dict(bound)
+    move_count = ai.move_count
+    last_distant_check = getattr(ai, '_last_distant_check', None)
+
+    ai.deadline = deadline
+    ai.cancelToken = SlotToken(slot)
+    try:
+        eval = -ai.negamax(ai.depth - 1, new_val, bound, -math.inf, -alpha, -1, 1)
+    except SearchTimeout:
+        return None
+    finally:
+        ai.undoMove(i, j, 1)
+        ai.deadline = None
+        ai.cancelToken = None
+
+    if not deterministic:
+        with _alphas.get_lock():
+            if eval > _alphas[slot]:
+                _alphas[slot] = eval
+    return (move, eval, eval > alpha, score, next_bound, ai.nodeCount,
+            move_count, last_distant_check, ai.pvTable[1])
+
+
+# Search settings of an engine, as a hashable tuple of (name, value)
+def search_settings(ai):
+    return tuple((name, getattr(ai, name)) for name in SETTINGS)
+
+
+def get_pool(workers, settings, pattern_dict, ttSizeMB=16):
+    key = (workers, ttSizeMB, settings, pattern_fingerprint(pattern_dict))
+    if key not in _pools:
+        alphas = multiprocessing.Array('d', [-math.inf] * SEARCH_SLOTS)
+        cancels = multiprocessing.Array('b', SEARCH_SLOTS)
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(ttSizeMB, alphas, cancels, settings, pattern_dict))
+        free = queue.Queue()
+        for slot in range(SEARCH_SLOTS):
+            free.put(slot)
+        _pools[key] = (executor, alphas, cancels, free)
+    return _pools[key]
+
+
+def shutdown():
+    for executor, _, _, _ in _pools.values():
+        executor.shutdown()
+    _pools.clear()
+
+
+# Whether the search of ai has to stop (deadline passed or cancel token set)
+def _stopped(ai):
+    return (ai.deadline is not None and time.time() > ai.deadline) \
+        or (ai.cancelToken is not None and ai.cancelToken.is_set())
+
+
+def parallel_search(ai, workers=None, deterministic=None, board_value=None, bound=None):
+    '''
+        Search the root candidates of ai in parallel, from board_value and
+        bound (default: boardValue and nextBound of ai), to depth ai.depth.
+        Returns the PrincipalVariation of the best move, also left in
+        currentI, currentJ, ourScore, boardValue and nextBound, or None if
+        there is no candidate, as searchRoot does. Raises SearchTimeout at
+        ai.deadline or when ai.cancelToken is set.
+        deterministic=True searches every root move with a full window and a
+        cleared worker state, so the chosen move does not depend on the
+        scheduling. Otherwise the workers share the best root score of this
+        search as alpha.
+    '''
+    workers = workers or ai.workers
+    deterministic = ai.deterministic if deterministic is None else deterministic
+    board_value = ai.boardValue if board_value is None else board_value
+    bound = ai.nextBound if bound is None else bound
+    executor, alphas, cancels, free = get_pool(workers, search_settings(ai), ai.patternDict,
+                                               ai.TTable.sizeMB)
+
+    key, sym = ai.searchKey()
+    entry = ai.TTable.probe(key)
+    hash_move = entry[3] if entry else None
+    if hash_move is not None and sym:
+        hash_move = transform_move(INVERSE[sym], *hash_move)
+    threats, forced = ai.threatMoves(1)
+    moves = list(ai.childNodes(bound, ai.widthAt(0), hash_move, 0, 1, threats, forced))
+    if not moves:
+        return None
+    state = ai.getState()
+    state['boardValue'], state['nextBound'] = board_value, dict(bound)
+    slot = free.get()
+    alphas[slot] = -math.inf
+    cancels[slot] = 0
+    futures = []
+    try:
+        futures = [executor.submit(_search_move, state, move, deterministic, slot, ai.deadline)
+                   for move in moves]
+        pending = futures
+        while pending:
+            _, pending = wait(pending, POLL)
+            if pending and _stopped(ai):
+                # The running tasks stop at their next time check, the queued ones are dropped
+                cancels[slot] = 1
+                for future in pending:
+                    future.cancel()
+        results = [future.result() for future in futures if not future.cancelled()]
+    finally:
+        # The slot is reused only once no task of this search can read or write it
+        wait(futures)
+        free.put(slot)
+    if len(results) < len(futures) or None in results:
+        raise SearchTimeout()
+
+    # First candidate (in move order) with the highest exact score, like the sequential root
+    best = None
+    for result in results:
+        if result[2] and (best is None or result[1] > best[1]):
+            best = result
+    if best is None:
+        # Every move failed low: search again with full windows
+        return parallel_search(ai, workers, True, board_value, bound)
+    move, eval, _, score, next_bound, _, move_count, last_distant_check, line = best
+
+    ai.nodeCount += 1 + sum(result[5] for result in results)
+    pv = PrincipalVariation([move] + line, eval, ai.depth, score, MoveCandidates(next_bound))
+    ai.setVariation(pv)
+    ai.move_count = move_count
+    if last_distant_check is not None:
+        ai._last_distant_check = last_distant_check
+    return pv
@@ -0,0 +1,225 @@
+import hashlib
+import os
+import pickle
+from source.utils import N
+
+# Same direction order and window bounds used by GomokuAI.countPattern
+DIRECTIONS = [(1, 0), (1, 1), (0, 1), (-1, 1)]
+
+
+# Cells of the line segment around (i_0, j_0) scanned by countPattern
+def line_segment(i_0, j_0, di, dj):
+    '''
+        countPattern slides its windows between the offsets -max_steps and
+        +max_steps of the move (windows falling off the board never match),
+        so every pattern it can find lies in this list of in-board cells.
+        Returns the list of (i, j) positions, ordered along the direction.
+    '''
+    max_steps = min(5, N - 1 - i_0 if di == 1 else i_0,
+                    N - 1 - j_0 if dj == 1 else j_0)
+    positions = []
+    for step in range(-max_steps, max_steps + 1):
+        ni = i_0 + di * step
+        nj = j_0 + dj * step
+        if 0 <= ni < N and 0 <= nj < N:
+            positions.append((ni, nj))
+    return positions
+
+
+##### Ternary encoding of lines #####
+# A line of cells is encoded as sum(DIGIT[cell] * 3**k) with k the index in the line
+DIGIT = {0: 0, 1: 1, -1: 2}
+STATE = (0, 1, -1)  # inverse of DIGIT
+POW3 = [3 ** k for k in range(N + 1)]
+MAX_SEGMENT = 11  # longest segment returned by line_segment
+MIN_PATTERN = 4  # shortest pattern in create_pattern_dict
+LINE_CACHE_SIZE = 1 << 18  # whole-line scores kept by ShapeTable before clearing
+
+
+##### Board lines #####
+def create_lines():
+    '''
+        Every row, column and diagonal of the board (88 lines on 15x15,
+        including the short corner diagonals), as tuples of positions
+        ordered along their direction.
+        CELL_LINES[idx][d] = (line id, 3**k) with k the index of cell idx
+        in its line of direction DIRECTIONS[d].
+    '''
+    lines = []
+    cell_lines = [[None] * len(DIRECTIONS) for _ in range(N * N)]
+    for d, (di, dj) in enumerate(DIRECTIONS):
+        for i in range(N):
+            for j in range(N):
+                # Only start from the first cell of each line
+                if 0 <= i - di < N and 0 <= j - dj < N:
+                    continue
+                positions = []
+                ni, nj = i, j
+                while 0 <= ni < N and 0 <= nj < N:
+                    cell_lines[ni * N + nj][d] = (len(lines), POW3[len(positions)])
+                    positions.append((ni, nj))
+                    ni, nj = ni + di, nj + dj
+                lines.append(tuple(positions))
+    return lines, [tuple(entry) for entry in cell_lines]
+
+
+LINES, CELL_LINES = create_lines()
+LINE_LENGTHS = [len(line) for line in LINES]
+
+
+def create_segments():
+    '''
+        SEGMENTS[(i * N + j) * 4 + d] = (positions, center, line, start):
+            positions = cells of line_segment(i, j, *DIRECTIONS[d])
+            center = index of (i, j) in positions
+            line = id of the board line holding the segment
+            start = index of the first segment cell in that line
+    '''
+    segments = []
+    for i in range(N):
+        for j in range(N):
+            for d, (di, dj) in enumerate(DIRECTIONS):
+                positions = tuple(line_segment(i, j, di, dj))
+                line = CELL_LINES[i * N + j][d][0]
+                start = LINES[line].index(positions[0])
+                segments.append((positions, positions.index((i, j)), line, start))
+    return segments
+
+
+SEGMENTS = create_segments()
+
+
+def encode_line(line):
+    code = 0
+    for k, cell in enumerate(line):
+        code += DIGIT[cell] * POW3[k]
+    return code
+
+
+def decode_line(code, length):
+    line = []
+    for _ in range(length):
+        code, digit = divmod(code, 3)
+        line.append(STATE[digit])
+    return tuple(line)
+
+
+def pattern_fingerprint(pattern_dict):
+    items = sorted((pattern, float(score)) for pattern, score in pattern_dict.items())
+    return hashlib.sha1(repr(items).encode()).hexdigest()
+
+
+class PatternMatcher():
+    '''
+        Precompiled form of the pattern dictionary.
+        Patterns are grouped by length into hash tables, so matching a line
+        costs one lookup per (length, window start) instead of one window
+        scan per pattern.
+    '''
+    def __init__(self, pattern_dict):
+        self.lengths = sorted(set(len(pattern) for pattern in pattern_dict))
+        # {pattern: (score, |score|, offsets of the empty cells)}
+        self.table = {}
+        for pattern, score in pattern_dict.items():
+            empties = tuple(idx for idx, cell in enumerate(pattern) if cell == 0)
+            self.table[pattern] = (score, abs(score), empties)
+
+    def match(self, line):
+        '''
+            line = tuple of cell states (-1, 0, 1)
+            Returns (score, marks):
+                score = sum of the scores of every pattern occurrence
+                marks = {index in line: summed |score| of the occurrences
+                         that leave that (empty) cell open}
+        '''
+        table = self.table
+        size = len(line)
+        score = 0
+        marks = {}
+        for length in self.lengths:
+            for start in range(size - length + 1):
+                entry = table.get(line[start:start + length])
+                if entry is None:
+                    continue
+                score += entry[0]
+                for offset in entry[2]:
+                    idx = start + offset
+                    marks[idx] = marks.get(idx, 0) + entry[1]
+        return score, marks
+
+
+class ShapeTable():
+    '''
+        Score table of every line shape, keyed by (length, ternary code).
+        Each entry holds the PatternMatcher result for that shape:
+            (score, ((index in line, |score| mark), ...))
+        lazy=True fills the table on demand, lazy=False builds all the shapes
+        up to MAX_SEGMENT cells at startup (or loads them from cache_path).
+    '''
+    def __init__(self, pattern_dict, lazy=True, cache_path=None):
+        self.cache_path = cache_path
+        self.invalidate(pattern_dict)
+        if not lazy:
+            if not self.load():
+                self.build()
+                self.save()
+
+    # Drop every stored shape, recompiling the patterns if given
+    def invalidate(self, pattern_dict=None):
+        if pattern_dict is not None:
+            self.matcher = PatternMatcher(pattern_dict)
+            self.fingerprint = pattern_fingerprint(pattern_dict)
+        self.shapes = [{} for _ in range(MAX_SEGMENT + 1)]
+        self.lines = {}  # {(length, code): score} of whole board lines
+
+    def lookup(self, length, code):
+        shape = self.shapes[length].get(code)
+        if shape is None:
+            score, marks = self.matcher.match(decode_line(code, length))
+            shape = (score, tuple(marks.items()))
+            self.shapes[length][code] = shape
+        return shape
+
+    # Pattern score of a whole board line (bounded cache, scores only)
+    def lineScore(self, length, code):
+        key = (length, code)
+        score = self.lines.get(key)
+        if score is None:
+            if len(self.lines) >= LINE_CACHE_SIZE:
+                self.lines.clear()
+            score = self.matcher.match(decode_line(code, length))[0]
+            self.lines[key] = score
+        return score
+
+    def build(self):
+        empty = (0, ())
+        for length in range(1, MAX_SEGMENT + 1):
+            shapes = self.shapes[length]
+            for code in range(POW3[length]):
+                if length < MIN_PATTERN:
+                    shapes[code] = empty
+                elif code not in shapes:
+                    self.lookup(length, code)
+
+    def save(self, path=None):
+        path = path or self.cache_path
+        if path is None:
+            return False
+        with open(path, 'wb') as f:
+            pickle.dump((self.fingerprint, self.shapes), f, pickle.HIGHEST_PROTOCOL)
+        return True
+
+    # Load a cached table, only if it was built from the same patterns
+    def load(self, path=None):
+        path = path or self.cache_path
+        if path is None or not os.path.exists(path):
+            return False
+        try:
+            with open(path, 'rb') as f:
+                fingerprint, shapes = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return False
+        if fingerprint != self.fingerprint:
+            return False
+        self.shapes = shapes
+        return True
@@ -0,0 +1,84 @@
+from source.utils import N
+
+
+# Board filled with a striped pattern (no five in a row), centre box left empty
+def near_full_board():
+    '''
+        Stripes of 2 along columns and diagonals, alternating along rows,
+        so neither side has more than 2 stones in a row. The 5x5 centre
+        box stays empty; AI and human stones are interleaved into moves.
+    '''
+    stones = {1: [], -1: []}
+    for i in range(N):
+        for j in range(N):
+            if 5 <= i <= 9 and 5 <= j <= 9:
+                continue
+            stones[1 if (i + 2 * j) % 4 < 2 else -1].append((i, j))
+    count = min(len(stones[1]), len(stones[-1]))
+    moves = []
+    for (ai_i, ai_j), (human_i, human_j) in zip(stones[1][:count], stones[-1][:count]):
+        moves += [(ai_i, ai_j, 1), (human_i, human_j, -1)]
+    return moves
+
+
+##### Fixed positions for search analysis #####
+# Each position is the list of moves (i, j, state) played from the empty board,
+# with 1 = AI and -1 = human. Every position ends with a human move, so the
+# AI is the side to move.
+POSITIONS = {
+    'opening': [(7, 7, 1), (8, 7, -1)],
+
+    'early': [(7, 7, 1), (8, 7, -1), (6, 6, 1), (9, 7, -1), (5, 7, 1), (8, 8, -1)],
+
+    'midgame': [(7, 7, 1), (6, 8, -1), (6, 7, 1), (8, 6, -1), (5, 6, 1), (4, 7, -1),
+                (5, 7, 1), (5, 9, -1), (3, 6, 1), (3, 5, -1), (2, 6, 1), (9, 7, -1)],
+
+    # Human open three on row 8: the AI has to block it
+    'defend_three': [(7, 7, 1), (8, 6, -1), (7, 8, 1), (8, 7, -1), (5, 5, 1), (8, 8, -1)],
+
+    # AI four on row 7 with an open end: winning move available
+    'win_in_one': [(7, 7, 1), (8, 7, -1), (7, 8, 1), (8, 8, -1), (7, 9, 1), (9, 9, -1),
+                   (7, 10, 1), (7, 11, -1)],
+
+    'late': [(7, 7, 1), (6, 6, -1), (6, 7, 1), (5, 6, -1), (7, 6, 1), (4, 6, -1),
+             (3, 6, 1), (6, 8, -1), (3, 5, 1), (3, 7, -1), (5, 5, 1), (8, 7, -1),
+             (4, 7, 1), (9, 8, -1), (4, 4, 1), (6, 9, -1), (5, 10, 1), (5, 4, -1),
+             (2, 5, 1), (9, 9, -1), (1, 4, 1), (3, 4, -1)],
+
+    # Human broken four on row 8 (cols 4-8, gap on 7): the AI has to fill the gap
+    'defend_four': [(7, 7, 1), (8, 5, -1), (6, 6, 1), (8, 6, -1), (5, 9, 1), (8, 8, -1),
+                    (9, 9, 1), (8, 4, -1)],
+
+    # Human split three on column 8 (rows 5, 7, 8): the AI has to block it
+    'defend_split': [(7, 7, 1), (7, 8, -1), (6, 7, 1), (5, 8, -1), (9, 6, 1), (8, 8, -1)],
+
+    # Human open three on the diagonal (6, 6) - (8, 8): the AI has to block an end
+    'defend_diag': [(7, 8, 1), (7, 7, -1), (9, 6, 1), (8, 8, -1), (5, 8, 1), (6, 6, -1)],
+
+    'near_full': near_full_board(),
+}
+
+# Positions grouped by game stage
+CORPUS = {
+    'opening': ['opening', 'early'],
+    'midgame': ['midgame', 'late'],
+    'tactical': ['defend_three', 'defend_four', 'win_in_one', 'defend_split', 'defend_diag'],
+    'endgame': ['near_full'],
+}
+
+# Correct answers of the tactical positions (any of the listed moves)
+EXPECTED = {
+    'defend_three': [(8, 5), (8, 9)],
+    'defend_four': [(8, 7)],
+    'win_in_one': [(7, 6)],
+    'defend_split': [(4, 8), (6, 8), (9, 8)],
+    'defend_diag': [(5, 5), (9, 9)],
+}
+
+
+# Replay the moves of a position on a fresh GomokuAI
+def setup_position(ai, moves):
+    for i, j, state in moves:
+        ai.playMove(i, j, state)
+    ai.turn = 1
+    return ai
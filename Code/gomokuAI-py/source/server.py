@@ -0,0 +1,327 @@
+import asyncio
+import copy
+import json
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from source.AI import GomokuAI
+import source.gomoku as gomoku
+
+##### Game server #####
+# Many independent games over a small JSON/HTTP API (asyncio, standard
+# library only). AI moves run in a process pool of warm engines; human
+# moves are cheap and applied in the server process. WebSocket is not
+# served: clients poll the HTTP endpoints.
+#
+#   POST   /games                {"depth": 4, "ai_first": false}  create a game
+#   GET    /games/<id>                                             game state
+#   POST   /games/<id>/move      {"i": 7, "j": 8}                  human move
+#   POST   /games/<id>/ai-move                                     AI move
+#   POST   /games/<id>/resign                                      human resigns
+#   DELETE /games/<id>                                             close the game
+#
+# Example:
+#   python -m source.server --port 8080 --workers 4
+
+_engine = None  # GomokuAI of the worker process
+
+
+def _init_worker(shapeCache):
+    global _engine
+    # Pattern shapes built (or loaded from shapeCache) once per worker
+    _engine = GomokuAI(lazyShapes=False, shapeCache=shapeCache)
+
+
+def _ready():
+    return True
+
+
+def _ai_turn(state, timeBudget):
+    '''AI move of a game state in the worker: (new state, (i, j))'''
+    ai = _engine
+    ai.loadState(state)
+    ai.timeBudget = timeBudget
+    move = gomoku.ai_turn(ai, verbose=False)
+    return ai.getState(), move
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Session():
+    '''One game: engine state (GomokuAI.getState), moves and status'''
+    def __init__(self, state, depth):
+        self.id = uuid.uuid4().hex
+        state['depth'] = depth
+        self.state = state
+        self.moves = []  # [(i, j, 1 = AI / -1 = human)]
+        self.status = 'human_turn'  # ai_turn, human_turn, ai_won, human_won, draw, resigned
+        self.lock = asyncio.Lock()  # one AI search per game at a time
+        self.lastAccess = time.time()
+
+    def toDict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'depth': self.state['depth'],
+            'moves': self.moves,
+            'board': self.state['boardMap'],
+        }
+
+
+class GameServer():
+    '''
+        Hosts the sessions and the engine pool.
+            moveTimeout  = seconds allowed to an AI move (iterative deepening
+                           gets 80% of it, the request fails with 504 after it)
+            sessionTimeout = idle seconds before a session is dropped
+            maxPending   = AI moves queued or running before new ones get 503
+                           (a timed out move counts until its worker is free)
+    '''
+    def __init__(self, workers=2, moveTimeout=10.0, sessionTimeout=1800.0, maxPending=16,
+                 maxSessions=1000, shapeCache=None):
+        self.workers = workers
+        self.moveTimeout = moveTimeout
+        self.sessionTimeout = sessionTimeout
+        self.maxPending = maxPending
+        self.maxSessions = maxSessions
+        self.shapeCache = shapeCache
+        self.sessions = {}
+        self.pending = set()  # futures of the AI moves queued or running in the pool
+        self.executor = None
+        self.server = None
+        self.local = GomokuAI()  # applies the human moves in the server process
+        self.newState = self.local.getState()  # state of an empty board
+
+    async def start(self, host='127.0.0.1', port=8080):
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                            initargs=(self.shapeCache,))
+        # Start the workers (and build their tables) before accepting connections,
+        # so that the forked processes do not inherit client sockets
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(self.executor, _ready) for _ in range(self.workers)])
+        self.server = await asyncio.start_server(self.handle, host, port)
+        self.reaper = asyncio.ensure_future(self.expireSessions())
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def stop(self):
+        self.reaper.cancel()
+        self.server.close()
+        await self.server.wait_closed()
+        self.executor.shutdown()
+
+    async def expireSessions(self):
+        while True:
+            await asyncio.sleep(min(60.0, self.sessionTimeout))
+            now = time.time()
+            for session_id in [key for key, session in self.sessions.items()
+                               if now - session.lastAccess > self.sessionTimeout
+                               and not session.lock.locked()]:
+                del self.sessions[session_id]
+
+    ##### HTTP #####
+    async def handle(self, reader, writer):
+        try:
+            try:
+                request_line = await reader.readline()
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, value = line.decode('latin-1').split(':', 1)
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                try:
+                    payload = json.loads(body) if body else {}
+                    if not isinstance(payload, dict):
+                        raise HTTPError(400, 'The body must be a JSON object')
+                    status, response = await self.route(method, path.split('?')[0], payload)
+                except HTTPError as error:
+                    status, response = error.status, {'error': error.message}
+                except (ValueError, KeyError, TypeError, OverflowError) as error:
+                    status, response = 400, {'error': 'Bad request: {}'.format(error)}
+            except (ValueError, asyncio.IncompleteReadError):
+                status, response = 400, {'error': 'Malformed HTTP request'}
+            except Exception as error:
+                # Any other failure (a crashed worker, a bug) still gets an answer
+                traceback.print_exc()
+                status, response = 500, {'error': 'Internal server error: {}'.format(type(error).__name__)}
+            data = json.dumps(response).encode()
+            writer.write('HTTP/1.1 {} {}\r\nContent-Type: application/json\r\n'
+                         'Content-Length: {}\r\nConnection: close\r\n\r\n'.format(
+                             status, STATUS_TEXT.get(status, ''), len(data)).encode() + data)
+            await writer.drain()
+        except ConnectionError:
+            pass  # the client went away
+        finally:
+            writer.close()
+
+    async def route(self, method, path, payload):
+        parts = [part for part in path.split('/') if part]
+        if parts == ['games'] and method == 'POST':
+            return 201, self.createGame(payload)
+        if len(parts) >= 2 and parts[0] == 'games':
+            session = self.getSession(parts[1])
+            action = parts[2] if len(parts) == 3 else None
+            if method == 'GET' and action is None:
+                return 200, session.toDict()
+            if method == 'DELETE' and action is None:
+                del self.sessions[session.id]
+                return 200, {'id': session.id, 'status': 'closed'}
+            if method == 'POST' and action == 'move':
+                return 200, self.playMove(session, int(payload['i']), int(payload['j']))
+            if method == 'POST' and action == 'ai-move':
+                return 200, await self.aiMove(session)
+            if method == 'POST' and action == 'resign':
+                self.checkPlaying(session)
+                session.status = 'resigned'
+                return 200, session.toDict()
+        raise HTTPError(404, 'Unknown endpoint: {} {}'.format(method, path))
+
+    ##### Games #####
+    def createGame(self, payload):
+        if len(self.sessions) >= self.maxSessions:
+            raise HTTPError(503, 'Too many games')
+        depth = int(payload.get('depth', 4))
+        if not 1 <= depth <= 8:
+            raise HTTPError(400, 'depth must be between 1 and 8')
+        session = Session(copy.deepcopy(self.newState), depth)
+        if payload.get('ai_first', False):
+            session.status = 'ai_turn'
+        self.sessions[session.id] = session
+        return session.toDict()
+
+    def getSession(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise HTTPError(404, 'No game with id ' + session_id)
+        session.lastAccess = time.time()
+        return session
+
+    def checkPlaying(self, session, status=None):
+        if session.status not in ('ai_turn', 'human_turn'):
+            raise HTTPError(409, 'The game is over: ' + session.status)
+        if status is not None and session.status != status:
+            raise HTTPError(409, 'Not your turn: ' + session.status)
+
+    # Status after a move, from the engine state the move was played on
+    def updateStatus(self, session, ai, state):
+        result = ai.checkResult()
+        if result == 1:
+            session.status = 'ai_won'
+        elif result == -1:
+            session.status = 'human_won'
+        elif result == 0:
+            session.status = 'draw'
+        else:
+            session.status = 'human_turn' if state == 1 else 'ai_turn'
+
+    def playMove(self, session, i, j):
+        self.checkPlaying(session, 'human_turn')
+        if session.lock.locked():
+            raise HTTPError(409, 'The AI is still thinking')
+        ai = self.local
+        ai.loadState(session.state)
+        if not ai.isValid(i, j):
+            raise HTTPError(400, 'Invalid move: ({}, {})'.format(i, j))
+        gomoku.human_turn(ai, i, j)
+        session.state = ai.getState()
+        session.moves.append((i, j, -1))
+        self.updateStatus(session, ai, -1)
+        return session.toDict()
+
+    async def aiMove(self, session):
+        self.checkPlaying(session, 'ai_turn')
+        if session.lock.locked():
+            raise HTTPError(409, 'The AI is already thinking')
+        if len(self.pending) >= self.maxPending:
+            raise HTTPError(503, 'Server busy, retry later')
+        async with session.lock:
+            # The pool future leaves pending when the worker is done, not when the request gives up
+            future = self.executor.submit(_ai_turn, session.state, 0.8 * self.moveTimeout)
+            self.pending.add(future)
+            future.add_done_callback(self.pending.discard)
+            try:
+                state, (i, j) = await asyncio.wait_for(asyncio.wrap_future(future), self.moveTimeout)
+            except asyncio.TimeoutError:
+                raise HTTPError(504, 'The AI move timed out')
+        session.state = state
+        session.moves.append((i, j, 1))
+        ai = self.local
+        ai.loadState(state)
+        self.updateStatus(session, ai, 1)
+        return dict(session.toDict(), move=[i, j])
+
+
+STATUS_TEXT = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found', 409: 'Conflict',
+               500: 'Internal Server Error', 503: 'Service Unavailable', 504: 'Gateway Timeout'}
+
+
+##### In-process client #####
+class GameClient():
+    '''Minimal asyncio client of the API: await client.request('POST', '/games', {...})'''
+    def __init__(self, host='127.0.0.1', port=8080):
+        self.host = host
+        self.port = port
+
+    async def request(self, method, path, payload=None):
+        '''Returns (status, decoded JSON body)'''
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode() if payload is not None else b''
+        writer.write('{} {} HTTP/1.1\r\nHost: {}\r\nContent-Type: application/json\r\n'
+                     'Content-Length: {}\r\nConnection: close\r\n\r\n'.format(
+                         method, path, self.host, len(body)).encode() + body)
+        await writer.drain()
+        status_line = await reader.readline()
+        status = int(status_line.split()[1])
+        while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+        data = await reader.read()
+        writer.close()
+        return status, json.loads(data)
+
+    async def createGame(self, depth=4, ai_first=False):
+        return await self.request('POST', '/games', {'depth': depth, 'ai_first': ai_first})
+
+    async def move(self, game_id, i, j):
+        return await self.request('POST', '/games/{}/move'.format(game_id), {'i': i, 'j': j})
+
+    async def aiMove(self, game_id):
+        return await self.request('POST', '/games/{}/ai-move'.format(game_id))
+
+    async def resign(self, game_id):
+        return await self.request('POST', '/games/{}/resign'.format(game_id))
+
+    async def get(self, game_id):
+        return await self.request('GET', '/games/{}'.format(game_id))
+
+
+async def serve(host, port, **options):
+    server = GameServer(**options)
+    address = await server.start(host, port)
+    print('Gomoku server listening on {}:{}'.format(*address))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Gomoku game server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=2, help='engine processes')
+    parser.add_argument('--move-timeout', type=float, default=10.0, help='seconds per AI move')
+    parser.add_argument('--max-pending', type=int, default=16, help='AI moves queued before 503')
+    parser.add_argument('--shape-cache', default=None, help='pickle file of the pattern shape table')
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, workers=args.workers, moveTimeout=args.move_timeout,
+                      maxPending=args.max_pending, shapeCache=args.shape_cache))
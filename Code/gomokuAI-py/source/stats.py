@@ -0,0 +1,196 @@
+import json
+import time
+
+# Methods of GomokuAI replaced by counting wrappers while the stats are attached
+WRAPPED = ('searchRoot', 'negamax', 'storeCutoff', 'evaluate', 'findForcedWin', 'bookMove')
+
+
+class SearchStats():
+    '''
+        Opt-in instrumentation of a GomokuAI, enabled by ai.enableStats().
+        The counted methods are wrapped on the instance only, so an engine
+        without stats runs the plain methods at no cost.
+        One record per ai_move is appended to `moves`:
+            nodes / cutoffs per ply, index of the cutoff move among the
+            children searched, TT probes/hits/stores, evaluate calls and
+            time, shape table lookups and misses, branching factor and phase
+            times. Searches run by SearchWorker while pondering are tagged
+            with ponder = True.
+        Root searches, threat searches and book probes are also kept as
+        trace events, exported with chromeTrace() (chrome://tracing format).
+        Nodes searched by parallel_search workers are not counted.
+    '''
+    def __init__(self):
+        self.moves = []
+        self.events = []
+        self.pondering = False  # set by SearchWorker around its ponder searches
+        self.origin = time.perf_counter()
+        self.reset()
+
+    # Counters of the current move
+    def reset(self):
+        self.nodes = {}  # {ply: nodes}
+        self.cutoffs = {}  # {ply: beta cutoffs}
+        self.cutoffIndex = {}  # {index of the cutoff move: cutoffs}
+        self.interior = 0  # nodes with at least one child searched
+        self.children = 0  # children searched by the interior nodes
+        self.calls = {'evaluate': 0}
+        self.times = {'evaluate': 0.0}
+        self.shapeLookups = 0
+        self.shapeMisses = 0  # shapes matched against the patterns (not yet in the table)
+        self.stack = []  # [children, last child move] of the nodes being searched
+        self.moveEvents = []
+
+    def event(self, name, start, end=None, args=None):
+        end = time.perf_counter() if end is None else end
+        event = {'name': name, 'ph': 'X', 'pid': 1, 'tid': 1,
+                 'ts': (start - self.origin) * 1e6, 'dur': (end - start) * 1e6,
+                 'args': args or {}}
+        self.events.append(event)
+        self.moveEvents.append(event)
+
+    ##### Wrappers #####
+    def attach(self, ai):
+        storeCutoff = ai.storeCutoff
+
+        def cutoff(i, j, state, depth, ply):
+            self.cutoffs[ply] = self.cutoffs.get(ply, 0) + 1
+            index = self.stack[-1][0] - 1
+            self.cutoffIndex[index] = self.cutoffIndex.get(index, 0) + 1
+            return storeCutoff(i, j, state, depth, ply)
+
+        for name in ('searchRoot', 'negamax'):
+            setattr(ai, name, self._node(ai, name, getattr(ai, name)))
+        ai.storeCutoff = cutoff
+        ai.evaluate = self._timed('evaluate', ai.evaluate)
+        ai.shapeTable.lookup = self._lookup(ai.shapeTable)
+        for name in ('findForcedWin', 'bookMove'):
+            setattr(ai, name, self._traced(name, getattr(ai, name)))
+
+    def detach(self, ai):
+        for name in WRAPPED:
+            ai.__dict__.pop(name, None)
+        ai.shapeTable.__dict__.pop('lookup', None)
+
+    # Node counting wrapper of the search (root or interior nodes)
+    def _node(self, ai, name, search):
+        '''
+            Children are counted per move: the PVS re-searches and the late
+            move reduction probes of a child search the same move again, they
+            count as nodes but not as more children of the parent.
+        '''
+        def wrapper(depth, *args):
+            stack = self.stack
+            ply = len(stack)  # the reduced searches do not search at ai.depth - ply
+            if stack:
+                move = ai.searchMoves[-1]
+                if stack[-1][1] != move:
+                    stack[-1][0] += 1
+                    stack[-1][1] = move
+            else:
+                start = time.perf_counter()
+            self.nodes[ply] = self.nodes.get(ply, 0) + 1
+            stack.append([0, None])
+            try:
+                return search(depth, *args)
+            finally:
+                children = stack.pop()[0]
+                if children:
+                    self.interior += 1
+                    self.children += children
+                if not stack:
+                    self.event(name, start, args={'depth': depth})
+        return wrapper
+
+    def _timed(self, name, method):
+        clock = time.perf_counter
+
+        def wrapper(*args):
+            start = clock()
+            try:
+                return method(*args)
+            finally:
+                self.calls[name] += 1
+                self.times[name] += clock() - start
+        return wrapper
+
+    def _lookup(self, table):
+        lookup = table.lookup
+
+        def wrapper(length, code):
+            self.shapeLookups += 1
+            if code not in table.shapes[length]:
+                self.shapeMisses += 1
+            return lookup(length, code)
+        return wrapper
+
+    def _traced(self, name, method):
+        def wrapper(*args):
+            start = time.perf_counter()
+            try:
+                return method(*args)
+            finally:
+                self.event(name, start)
+        return wrapper
+
+    ##### Per-move records #####
+    def start(self, ai):
+        self.reset()
+        self.moveStart = time.perf_counter()
+        self.ttStart = ai.TTable.stats()
+
+    def finish(self, ai, move):
+        '''Close the record of the current move, append it to moves and return it'''
+        end = time.perf_counter()
+        tt = ai.TTable.stats()
+        probes = tt['probes'] - self.ttStart['probes']
+        hits = tt['hits'] - self.ttStart['hits']
+        cutoffs = sum(self.cutoffs.values())
+        record = {
+            'move': list(move),
+            'ponder': self.pondering,
+            'time': end - self.moveStart,
+            'nodes': sum(self.nodes.values()),
+            'nodes_per_ply': self.nodes,
+            'cutoffs': cutoffs,
+            'cutoffs_per_ply': self.cutoffs,
+            'cutoff_index': dict(sorted(self.cutoffIndex.items())),
+            'first_move_cutoff_rate': self.cutoffIndex.get(0, 0) / cutoffs if cutoffs else 0.0,
+            'branching_factor': self.children / self.interior if self.interior else 0.0,
+            'tt': {
+                'probes': probes,
+                'hits': hits,
+                'hit_rate': hits / probes if probes else 0.0,
+                'stores': tt['stores'] - self.ttStart['stores'],
+            },
+            'evaluate': {'calls': self.calls['evaluate'], 'time': self.times['evaluate']},
+            'shapes': {'lookups': self.shapeLookups, 'misses': self.shapeMisses},
+            'phases': [(event['name'], event['dur'] / 1e6) for event in self.moveEvents],
+        }
+        self.moves.append(record)
+        self.event('ai_move', self.moveStart, end, {'move': list(move)})
+        return record
+
+    @property
+    def last(self):
+        return self.moves[-1] if self.moves else None
+
+    ##### Export #####
+    def toDict(self):
+        return {'moves': self.moves}
+
+    def toJSON(self, path=None):
+        '''JSON string of the records, also written to path if given'''
+        text = json.dumps(self.toDict(), indent=2)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(text)
+        return text
+
+    def chromeTrace(self, path=None):
+        '''Trace events (load the file in chrome://tracing or Perfetto)'''
+        trace = {'traceEvents': self.events, 'displayTimeUnit': 'ms'}
+        if path is not None:
+            with open(path, 'w') as f:
+                json.dump(trace, f)
+        return trace
@@ -0,0 +1,59 @@
+from source.utils import N
+
+M = N - 1
+
+##### The 8 symmetries of the square board #####
+# TRANSFORMS[t](i, j) = image of cell (i, j) under symmetry t
+TRANSFORMS = [
+    lambda i, j: (i, j),            # identity
+    lambda i, j: (j, M - i),        # rotation 90
+    lambda i, j: (M - i, M - j),    # rotation 180
+    lambda i, j: (M - j, i),        # rotation 270
+    lambda i, j: (i, M - j),        # horizontal mirror
+    lambda i, j: (M - i, j),        # vertical mirror
+    lambda i, j: (j, i),            # main diagonal
+    lambda i, j: (M - j, M - i),    # anti-diagonal
+]
+
+# INVERSE[t] = symmetry undoing t (only the 2 rotations of 90 degrees differ)
+INVERSE = [0, 3, 2, 1, 4, 5, 6, 7]
+
+
+def create_cell_maps():
+    '''CELL_MAP[t][idx] = index of the image of cell idx = i * N + j under t'''
+    cell_maps = []
+    for transform in TRANSFORMS:
+        cells = []
+        for idx in range(N * N):
+            i, j = transform(*divmod(idx, N))
+            cells.append(i * N + j)
+        cell_maps.append(cells)
+    return cell_maps
+
+
+CELL_MAP = create_cell_maps()
+
+
+def transform_move(t, i, j):
+    return divmod(CELL_MAP[t][i * N + j], N)
+
+
+def symmetric_hashes(zobristTable, sideKey, ai_stones, human_stones):
+    '''
+        Zobrist hash of the position under each of the 8 symmetries, computed
+        like GomokuAI.rollingHash (stone keys and one side key per stone).
+        ai_stones / human_stones are lists of (i, j).
+    '''
+    keys = [0] * len(TRANSFORMS)
+    for side, stones in ((0, ai_stones), (1, human_stones)):
+        for i, j in stones:
+            idx = i * N + j
+            for t, cells in enumerate(CELL_MAP):
+                keys[t] ^= zobristTable[cells[idx] * 2 + side] ^ sideKey
+    return keys
+
+
+def canonical(keys):
+    '''(minimal key, symmetry giving it) of the 8 symmetric hashes'''
+    t = min(range(len(keys)), key=keys.__getitem__)
+    return keys[t], t
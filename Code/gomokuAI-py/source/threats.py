@@ -0,0 +1,295 @@
+from source.bitboard import FIVE_MASKS, popcount
+from source.patterns import LINES, POW3, decode_line
+from source.utils import N
+
+CACHE_SIZE = 1 << 16  # positions kept by the solver cache before clearing
+
+# Every 5-cell window of the board, once
+WINDOWS = list(dict.fromkeys(mask for masks in FIVE_MASKS for mask in masks))
+
+
+##### Threat detection on bitmasks #####
+# mine / theirs = occupancy masks of the attacker and of the defender
+def five_mask(mine, theirs):
+    '''Empty cells where `mine` completes five (4 stones + 1 empty in a window)'''
+    cells = 0
+    for mask in WINDOWS:
+        if not mask & theirs:
+            rest = mask & ~mine
+            if rest and not rest & (rest - 1):
+                cells |= rest
+    return cells
+
+
+def four_mask(mine, theirs):
+    '''Empty cells where `mine` makes a four (3 stones + 2 empty in a window)'''
+    cells = 0
+    for mask in WINDOWS:
+        if not mask & theirs:
+            rest = mask & ~mine
+            if rest and popcount(rest) == 2:
+                cells |= rest
+    return cells
+
+
+def three_mask(mine, theirs):
+    '''Empty cells of the windows holding 2 stones of `mine` and no opponent'''
+    cells = 0
+    for mask in WINDOWS:
+        if not mask & theirs:
+            rest = mask & ~mine
+            if popcount(rest) == 3:
+                cells |= rest
+    return cells
+
+
+def is_five(stones, bit):
+    '''Whether the stone on `bit` is part of five in a row of `stones`'''
+    for mask in FIVE_MASKS[bit.bit_length() - 1]:
+        if stones & mask == mask:
+            return True
+    return False
+
+
+def has_open_four_move(mine, theirs):
+    '''Whether `mine` has a move giving 2 different ways to complete five'''
+    moves = four_mask(mine, theirs)
+    while moves:
+        move = moves & -moves
+        moves ^= move
+        wins = five_mask(mine | move, theirs)
+        if wins & (wins - 1):
+            return True
+    return False
+
+
+def bits(mask):
+    '''Single-bit masks of a mask, from the lowest cell index'''
+    while mask:
+        low = mask & -mask
+        yield low
+        mask ^= low
+
+
+def to_move(bit):
+    return divmod(bit.bit_length() - 1, N)
+
+
+##### Threat cells of the board lines #####
+def create_window_tables():
+    '''
+        Threat cells of every 5-cell and 6-cell window, indexed by the
+        ternary code of the window (patterns.DIGIT), as index masks of the
+        window for the AI and the human ((0, 0) without threats):
+            FIVE_WINDOWS  = empty cell completing five (4 stones + 1 empty)
+            THREE_WINDOWS = empty cells of an open three (3 stones among
+                            the 4 inner cells, the rest empty)
+    '''
+    fives = []
+    for code in range(POW3[5]):
+        window = decode_line(code, 5)
+        fives.append(tuple(1 << window.index(0) if window.count(player) == 4 and 0 in window else 0
+                           for player in (1, -1)))
+    threes = []
+    for code in range(POW3[6]):
+        window = decode_line(code, 6)
+        empty = sum(1 << k for k in range(6) if window[k] == 0)
+        threes.append(tuple(empty if window[0] == window[5] == 0 and window.count(player) == 3
+                            and window.count(0) == 3 else 0
+                            for player in (1, -1)))
+    return fives, threes
+
+
+FIVE_WINDOWS, THREE_WINDOWS = create_window_tables()
+
+
+def line_threats(code, length):
+    '''
+        Threat cells of a line from its ternary code, as index masks of the
+        line: (AI fives, human fives, AI threes, human threes)
+    '''
+    ai_fives = human_fives = ai_threes = human_threes = 0
+    for start in range(length - 4):
+        window = code // POW3[start]
+        ai, human = FIVE_WINDOWS[window % 243]
+        ai_fives |= ai << start
+        human_fives |= human << start
+        if start < length - 5:
+            ai, human = THREE_WINDOWS[window % 729]
+            ai_threes |= ai << start
+            human_threes |= human << start
+    return ai_fives, human_fives, ai_threes, human_threes
+
+
+class LineThreats():
+    '''
+        Threat cells of the whole board from the ternary line codes kept by
+        GomokuAI (patterns.LINES order), cached by (line, code) as board
+        masks, so a lookup only ORs the entries of the lines holding threats.
+    '''
+    def __init__(self):
+        self.cache = {}  # {code * len(LINES) + line: board masks, or () without threats}
+
+    def _line(self, line, code):
+        if len(self.cache) >= CACHE_SIZE:
+            self.cache.clear()
+        positions = LINES[line]
+        masks = []
+        for mask in line_threats(code, len(positions)):
+            cells = 0
+            for k in range(len(positions)):
+                if mask >> k & 1:
+                    i, j = positions[k]
+                    cells |= 1 << (i * N + j)
+            masks.append(cells)
+        entry = tuple(masks) if any(masks) else ()
+        self.cache[code * len(LINES) + line] = entry
+        return entry
+
+    def masks(self, lineCodes):
+        '''(AI fives, human fives, AI threes, human threes) of the board'''
+        cache = self.cache
+        size = len(LINES)
+        ai_fives = human_fives = ai_threes = human_threes = 0
+        for line, code in enumerate(lineCodes):
+            entry = cache.get(code * size + line)
+            if entry is None:
+                entry = self._line(line, code)
+            if entry:
+                ai_fives |= entry[0]
+                human_fives |= entry[1]
+                ai_threes |= entry[2]
+                human_threes |= entry[3]
+        return ai_fives, human_fives, ai_threes, human_threes
+
+
+class ThreatSolver():
+    '''
+        Threat-space search: only the attacker's threat moves and the
+        defender's answers to them are searched.
+            VCF = victory by continuous fours (the defender reply is forced)
+            VCT = victory by continuous threats (fours and threes)
+        Depths count attacker moves. Results are cached by position in the
+        solver's own table.
+    '''
+    def __init__(self, vcfDepth=10, vctDepth=0):
+        self.vcfDepth = vcfDepth
+        self.vctDepth = vctDepth
+        self.cache = {}  # {(kind, mine, theirs): (depth, sequence or None)}
+        self.nodes = 0
+
+    def clear(self):
+        self.cache = {}
+
+    # Winning sequence [(i, j), ...] for `mine` to play first, or None
+    def solve(self, mine, theirs):
+        '''
+            None is a proof that no VCF exists within vcfDepth attacker
+            moves (and no VCT within vctDepth under the threat model).
+        '''
+        self.nodes = 0
+        sequence = self.vcf(mine, theirs, self.vcfDepth)
+        if sequence is None and self.vctDepth > 0:
+            sequence = self.vct(mine, theirs, self.vctDepth)
+        if sequence is None:
+            return None
+        return [to_move(bit) for bit in sequence]
+
+    def _cached(self, key, depth):
+        entry = self.cache.get(key)
+        if entry is not None and (entry[1] is not None or entry[0] >= depth):
+            return True, entry[1]
+        return False, None
+
+    def _store(self, key, depth, sequence):
+        if len(self.cache) >= CACHE_SIZE:
+            self.cache.clear()
+        self.cache[key] = (depth, sequence)
+
+    def vcf(self, mine, theirs, depth):
+        self.nodes += 1
+        wins = five_mask(mine, theirs)
+        if wins:
+            return [wins & -wins]
+        if depth <= 0:
+            return None
+
+        key = ('vcf', mine, theirs)
+        found, sequence = self._cached(key, depth)
+        if found:
+            return sequence
+
+        sequence = None
+        threats = five_mask(theirs, mine)
+        # The defender wins next move unless the four also blocks his five
+        if not threats & (threats - 1):
+            moves = four_mask(mine, theirs)
+            if threats:
+                moves &= threats
+            for move in bits(moves):
+                new_mine = mine | move
+                wins = five_mask(new_mine, theirs)
+                if wins & (wins - 1):
+                    # Open (or double) four: only one end can be blocked
+                    block = wins & -wins
+                    sequence = [move, block, wins ^ block]
+                    break
+                new_theirs = theirs | wins
+                if is_five(new_theirs, wins):
+                    continue
+                rest = self.vcf(new_mine, new_theirs, depth - 1)
+                if rest is not None:
+                    sequence = [move, wins] + rest
+                    break
+
+        self._store(key, depth, sequence)
+        return sequence
+
+    def vct(self, mine, theirs, depth):
+        sequence = self.vcf(mine, theirs, self.vcfDepth)
+        if sequence is not None or depth <= 0:
+            return sequence
+
+        key = ('vct', mine, theirs)
+        found, sequence = self._cached(key, depth)
+        if found:
+            return sequence
+
+        sequence = None
+        threats = five_mask(theirs, mine)
+        if not threats & (threats - 1):
+            moves = four_mask(mine, theirs) | three_mask(mine, theirs)
+            if threats:
+                moves &= threats
+            for move in bits(moves):
+                new_mine = mine | move
+                wins = five_mask(new_mine, theirs)
+                if wins:
+                    # A four: the reply is forced (VCF already covers double fours)
+                    defences = wins
+                elif has_open_four_move(new_mine, theirs):
+                    # A three: block any cell of its windows, or counter with a four
+                    defences = four_mask(new_mine, theirs) | four_mask(theirs, new_mine)
+                else:
+                    continue
+                line = self._refute(new_mine, theirs, defences, depth)
+                if line is not None:
+                    sequence = [move] + line
+                    break
+
+        self._store(key, depth, sequence)
+        return sequence
+
+    # Attacker line winning against every defence, or None if one holds
+    def _refute(self, mine, theirs, defences, depth):
+        principal = None
+        for defence in bits(defences):
+            new_theirs = theirs | defence
+            if is_five(new_theirs, defence):
+                return None
+            rest = self.vct(mine, new_theirs, depth - 1)
+            if rest is None:
+                return None
+            if principal is None:
+                principal = [defence] + rest
+        return principal
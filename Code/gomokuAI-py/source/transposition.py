@@ -0,0 +1,104 @@
+from array import array
+from source.utils import N
+
+# Bound type of a stored score
+EXACT = 0  # score is the exact minimax value
+LOWER = 1  # fail-high (beta cutoff): real value >= score
+UPPER = 2  # fail-low: real value <= score
+
+MASK64 = (1 << 64) - 1
+# bytes per slot: key (8) + score (8) + depth (1) + flag (1) + move (2) + sym (1)
+ENTRY_BYTES = 21
+
+
+class TranspositionTable():
+    '''
+        Fixed-capacity transposition table stored in preallocated arrays.
+        The table is split into buckets of 2 slots indexed by the low bits
+        of the hash:
+            slot 0 = depth-preferred (kept unless the new search is as deep)
+            slot 1 = always-replace
+        Each slot stores the hash bits above the index (key verification),
+        the score, the search depth, the bound type, the best move and the
+        symmetry that maps the searched board to the key (0 = identity).
+    '''
+    def __init__(self, sizeMB=16):
+        buckets = max(1, int(sizeMB * 1024 * 1024) // (2 * ENTRY_BYTES))
+        self.bits = buckets.bit_length() - 1  # round down to a power of 2
+        self.mask = (1 << self.bits) - 1
+        self.sizeMB = sizeMB
+        self.slots = 2 << self.bits
+
+        self.keys = array('Q', [0]) * self.slots
+        self.scores = array('d', [0.0]) * self.slots
+        self.depths = array('b', [-1]) * self.slots  # -1 = empty slot
+        self.flags = array('b', [EXACT]) * self.slots
+        self.moves = array('h', [-1]) * self.slots  # i * N + j, -1 = none
+        self.syms = array('b', [0]) * self.slots
+        self.resetStats()
+
+    def resetStats(self):
+        self.probes = 0
+        self.hits = 0
+        self.collisions = 0  # probes on an occupied bucket holding other positions
+        self.stores = 0
+        self.overwrites = 0  # stores that evicted another position
+
+    def clear(self):
+        self.depths = array('b', [-1]) * self.slots
+        self.resetStats()
+
+    # Look a position up: (score, depth, flag, move, sym) or None
+    def probe(self, key):
+        self.probes += 1
+        slot = (key & self.mask) << 1
+        check = (key >> self.bits) & MASK64
+        keys, depths = self.keys, self.depths
+        for s in (slot, slot + 1):
+            if depths[s] >= 0 and keys[s] == check:
+                self.hits += 1
+                move = self.moves[s]
+                return (self.scores[s], depths[s], self.flags[s],
+                        divmod(move, N) if move >= 0 else None, self.syms[s])
+        if depths[slot] >= 0 or depths[slot + 1] >= 0:
+            self.collisions += 1
+        return None
+
+    def store(self, key, score, depth, flag, move=None, sym=0):
+        self.stores += 1
+        slot = (key & self.mask) << 1
+        check = (key >> self.bits) & MASK64
+        keys, depths = self.keys, self.depths
+        if depths[slot] >= 0 and keys[slot] != check:
+            if depth >= depths[slot]:
+                # Deeper (or as deep) result: demote the old entry to the always-replace slot
+                self._write(slot + 1, keys[slot], self.scores[slot], depths[slot],
+                            self.flags[slot], self.moves[slot], self.syms[slot])
+            else:
+                slot += 1
+        self._write(slot, check, score, depth, flag,
+                    move[0] * N + move[1] if move is not None else -1, sym)
+
+    def _write(self, slot, check, score, depth, flag, move, sym):
+        if self.depths[slot] >= 0 and self.keys[slot] != check:
+            self.overwrites += 1
+        self.keys[slot] = check
+        self.scores[slot] = score
+        self.depths[slot] = depth
+        self.flags[slot] = flag
+        self.moves[slot] = move
+        self.syms[slot] = sym
+
+    def stats(self):
+        return {
+            'size_mb': self.sizeMB,
+            'slots': self.slots,
+            'probes': self.probes,
+            'hits': self.hits,
+            'hit_rate': self.hits / self.probes if self.probes else 0.0,
+            'collisions': self.collisions,
+            'collision_rate': self.collisions / self.probes if self.probes else 0.0,
+            'stores': self.stores,
+            'overwrites': self.overwrites,
+            'overwrite_rate': self.overwrites / self.stores if self.stores else 0.0,
+        }
@@ -1,5 +1,4 @@
 import random
-import uuid
 
 ##### For managing the interface #####
 SIZE = 540  # size of the board image
@@ -161,13 +160,17 @@ def create_pattern_dict():
 
 
 ##### Zobrist Hashing #####
-# Done
-def init_zobrist():
-    zTable = [[[uuid.uuid4().int for _ in range(2)] \
-               for j in range(15)] for i in range(15)]  # changed to 32 from 64
-    return zTable
-
-
-# Done
-def update_TTable(table, hash, score, depth):
-    table[hash] = [score, depth]
\ No newline at end of file
+ZOBRIST_SEED = 20240601  # fixed default seed: the same keys in every run and process
+
+
+def init_zobrist(seed=ZOBRIST_SEED):
+    '''
+        Seeded 64-bit Zobrist keys, as (table, side key):
+            table[(i * N + j) * 2 + side] = key of a stone on (i, j),
+                side 0 = AI, side 1 = human
+            side key = XORed on every move (set when the human is to move)
+    '''
+    rng = random.Random(seed)
+    zTable = [rng.getrandbits(64) for _ in range(N * N * 2)]
+    sideKey = rng.getrandbits(64)
+    return zTable, sideKey
\ No newline at end of file
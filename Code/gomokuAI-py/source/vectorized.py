@@ -0,0 +1,137 @@
+from source.patterns import LINES, SEGMENTS, MAX_SEGMENT, DIGIT
+import source.utils as utils
+from source.utils import N
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency: only needed by this evaluator
+    np = None
+
+PAD = 3  # digit of the padding cells after the end of a short line (never matches)
+
+##### Vectorized whole-board static evaluation #####
+# The 88 board lines are gathered into one (lines x N) array per board,
+# short diagonals padded with PAD. Every window of a pattern length is read
+# as a base-4 code through a sliding window view, and the codes index a
+# score table of that length.
+# Two scores are computed. scoreBoards counts every pattern occurrence of the
+# whole lines, like GomokuAI.staticScore. scoreMoves replays the clipped
+# segments that evaluate scores around each move (SEGMENTS, the countPattern
+# bounds), so it equals the boardValue accumulated by playMove. The two differ:
+# the segments of a move miss the windows beyond 5 cells of it, and along
+# row 0 or column 0 they miss every window. boardValue therefore depends on
+# the order of the moves, and an arbitrary board only has a whole-line score.
+
+
+def create_line_index():
+    '''
+        LINE_INDEX[line][k] = flat index (i * N + j) of cell k of the line,
+        or N * N (a padding cell) after the end of the line
+    '''
+    index = [[N * N] * N for _ in LINES]
+    for line, positions in enumerate(LINES):
+        for k, (i, j) in enumerate(positions):
+            index[line][k] = i * N + j
+    return index
+
+
+def create_segment_index():
+    '''
+        SEGMENT_INDEX[(i * N + j) * 4 + d] = flat indices of the cells of
+        segment SEGMENTS[(i * N + j) * 4 + d], padded with N * N up to
+        MAX_SEGMENT cells
+    '''
+    index = []
+    for positions, _, _, _ in SEGMENTS:
+        cells = [i * N + j for i, j in positions]
+        index.append(cells + [N * N] * (MAX_SEGMENT - len(cells)))
+    return index
+
+
+LINE_INDEX = create_line_index()
+SEGMENT_INDEX = create_segment_index()
+
+
+def board_lines(boards):
+    '''
+        Rows, columns and diagonals of a batch of boards.
+        boards = array (B, N, N) of states (-1, 0, 1), or a single (N, N) board
+        Returns an int8 array (B, len(LINES), N) of DIGIT values, in LINES order.
+    '''
+    boards = np.asarray(boards, dtype=np.int8)
+    if boards.ndim == 2:
+        boards = boards[None]
+    digits = np.full((boards.shape[0], N * N + 1), PAD, dtype=np.int8)
+    # DIGIT: 0 -> 0, 1 -> 1, -1 -> 2
+    digits[:, :N * N] = np.where(boards < 0, 2, boards).reshape(boards.shape[0], N * N)
+    return digits[:, np.asarray(LINE_INDEX)]
+
+
+class VectorizedEvaluator():
+    '''
+        Static pattern scores with NumPy (pattern scores are integers, so
+        the float sums agree exactly with the engine):
+            scoreBoards = sum of the scores of every pattern occurrence in
+                          every board line, as GomokuAI.staticScore
+            scoreMoves  = boardValue after playing a sequence of moves with
+                          playMove from an empty board
+    '''
+    def __init__(self, pattern_dict=None):
+        if np is None:
+            raise ImportError('numpy is required by VectorizedEvaluator (pip install numpy)')
+        self.setPatternDict(pattern_dict or utils.create_pattern_dict())
+
+    # Score tables {length: array of 4**length scores indexed by window code}
+    def setPatternDict(self, pattern_dict):
+        self.tables = {}
+        for pattern, score in pattern_dict.items():
+            length = len(pattern)
+            if length > N:
+                continue
+            if length not in self.tables:
+                self.tables[length] = np.zeros(4 ** length)
+            code = 0
+            for k, cell in enumerate(pattern):
+                code += DIGIT[cell] * 4 ** k
+            self.tables[length][code] += score
+        self.weights = {length: 4 ** np.arange(length, dtype=np.int32) for length in self.tables}
+
+    # Score of the windows of the last axis of cells (B, ..., length), as a float array (B,)
+    def scoreCells(self, cells):
+        cells = cells.astype(np.int32)
+        total = np.zeros(cells.shape[0])
+        for length, table in self.tables.items():
+            if length > cells.shape[-1]:
+                continue
+            windows = np.lib.stride_tricks.sliding_window_view(cells, length, axis=-1)
+            codes = windows @ self.weights[length]
+            total += table[codes].reshape(cells.shape[0], -1).sum(axis=1)
+        return total
+
+    # Scores of a batch of boards (B, N, N), as a float array (B,)
+    def scoreBoards(self, boards):
+        return self.scoreCells(board_lines(boards))
+
+    def scoreMoves(self, moves):
+        '''
+            boardValue after moves = [(i, j, state), ...] played with
+            playMove from an empty board: the sum over the moves of the
+            segment scores after the move minus before it.
+        '''
+        if not moves:
+            return 0.0
+        # digits[k] = board before move k (and after the last move), padding cell last
+        digits = np.zeros((len(moves) + 1, N * N + 1), dtype=np.int8)
+        digits[:, N * N] = PAD
+        for k, (i, j, state) in enumerate(moves):
+            digits[k + 1:, i * N + j] = DIGIT[state]
+        cells = np.array([i * N + j for i, j, _ in moves])
+        segments = np.asarray(SEGMENT_INDEX)[cells[:, None] * 4 + np.arange(4)]
+        steps = np.arange(len(moves))[:, None, None]
+        before = self.scoreCells(digits[steps, segments])
+        after = self.scoreCells(digits[steps + 1, segments])
+        return float((after - before).sum())
+
+    # Score of a single boardMap (list of lists or array)
+    def scoreBoard(self, boardMap):
+        return float(self.scoreBoards(boardMap)[0])
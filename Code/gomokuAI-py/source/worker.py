@@ -0,0 +1,143 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from source.AI import SearchTimeout, N
+import source.gomoku as gomoku
+
+##### Background search #####
+# ai_move runs in a worker thread, so the pygame loop keeps handling events
+# while the AI thinks. The engine must not be touched by the caller until
+# the future is done.
+# Pondering: during the human's turn, the likely human replies are played
+# on the engine and answered in the background. If the human plays one of
+# them, the answer is ready; otherwise the TT keeps the partial work.
+# While a job runs, the engine holds the moves of the search: the caller
+# checks the human moves with isValid, on the board saved before the job.
+
+
+class SearchWorker():
+    '''
+        Runs searches of one GomokuAI in a background thread.
+        Every job gets a cancel token (threading.Event) set as ai.cancelToken:
+        once set, the search raises SearchTimeout at its next time
+        check, the game state of the engine is restored and the job returns
+        None.
+    '''
+    def __init__(self, ai, ponderReplies=3):
+        self.ai = ai
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.future = None
+        self.token = None
+        self.occupied = 0  # occupancy mask of the board before the last job
+        self.ponderReplies = ponderReplies  # human replies searched while pondering (0 = off)
+        self.pondered = {}  # {human move: (engine state after the AI answer, AI move)}
+
+    # Run function(*args) on the engine in the background, return its future
+    def submit(self, function, *args):
+        if self.busy():
+            raise RuntimeError('A search is already running')
+        self.token = threading.Event()
+        bitboard = self.ai.bitboard
+        self.occupied = bitboard.ai | bitboard.human
+        self.future = self.executor.submit(self._run, self.token, function, *args)
+        return self.future
+
+    def _run(self, token, function, *args):
+        ai = self.ai
+        state = ai.getState()
+        ai.cancelToken = token
+        try:
+            result = function(*args)
+        except SearchTimeout:
+            result = None
+        finally:
+            ai.cancelToken = None
+        if token.is_set():
+            # Cancelled: drop the partial results of the search
+            ai.loadState(state)
+            return None
+        return result
+
+    # Search the AI move: the future resolves to (i, j), or None if cancelled
+    def search(self, verbose=True):
+        return self.submit(gomoku.ai_move, self.ai, verbose)
+
+    # Search the answers to the likely human replies in the background
+    def ponder(self):
+        self.pondered = {}
+        if self.ponderReplies <= 0:
+            return None
+        return self.submit(self._ponder)
+
+    def _ponder(self):
+        '''
+            The replies are the human's best candidates of nextBound. Each
+            one is played, answered with ai_move, and the engine state is
+            saved then rolled back (the TT keeps the search results).
+        '''
+        ai = self.ai
+        token = self.token
+        start = ai.getState()
+        replies = list(ai.childNodes(ai.nextBound, self.ponderReplies, state=-1))
+        if ai.stats is not None:
+            ai.stats.pondering = True  # the stats records are not played moves
+        try:
+            for i, j in replies:
+                if token.is_set():
+                    break
+                gomoku.human_turn(ai, i, j)
+                try:
+                    move = gomoku.ai_move(ai, verbose=False)
+                    if not token.is_set():
+                        self.pondered[(i, j)] = (ai.getState(), move)
+                finally:
+                    ai.loadState(start)
+        finally:
+            if ai.stats is not None:
+                ai.stats.pondering = False
+        return len(self.pondered)
+
+    def ponderHit(self, i, j):
+        '''
+            Stop pondering once the human played (i, j). On a pondered reply
+            the engine is left after the human move with the AI answer found
+            (currentI, currentJ = human move, as after human_turn), and the
+            AI move is returned. Otherwise returns None and the engine is
+            unchanged, so the human move is played as usual.
+        '''
+        self.cancel()
+        entry = self.pondered.get((i, j))
+        self.pondered = {}
+        if entry is None:
+            return None
+        state, move = entry
+        self.ai.loadState(state)
+        self.ai.currentI, self.ai.currentJ = i, j
+        return move
+
+    # Whether (i, j) is an empty cell of the board, also while a job runs
+    def isValid(self, i, j):
+        if not self.busy():
+            return self.ai.isValid(i, j)
+        return 0 <= i < N and 0 <= j < N and not self.occupied >> (i * N + j) & 1
+
+    def busy(self):
+        return self.future is not None and not self.future.done()
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+    # Result of the finished job (re-raises its exception), and forget it
+    def result(self):
+        future, self.future = self.future, None
+        return future.result()
+
+    def cancel(self, wait=True):
+        if self.token is not None:
+            self.token.set()
+        if wait and self.future is not None:
+            self.future.exception()  # wait for the job to stop
+            self.future = None
+
+    def shutdown(self):
+        self.cancel()
+        self.executor.shutdown()
@@ -0,0 +1,100 @@
+from source.AI import GomokuAI, N
+import argparse
+import random
+import sys
+
+# Differential check of the evaluators on random positions: evaluate (shape
+# table on the line codes) against evaluatePatterns (one countPattern scan
+# per pattern), on the move value and on the candidate score changes, for
+# every empty cell and both sides.
+# With --vectorized, the NumPy evaluator is also checked: scoreMoves against
+# the boardValue accumulated by playMove, and scoreBoards (one batch of all
+# the boards) against staticScore.
+# Example:
+#   python verify_eval.py --boards 100 --seed 1
+#   python verify_eval.py --boards 3000 --vectorized --no-evaluate
+
+
+def random_positions(count, seed=0, max_plies=60):
+    """
+        Yield (engine, moves) after random games of playMove from a random
+        first cell (moves drawn from nextBound), moves = [(i, j, state)]
+    """
+    rng = random.Random(seed)
+    for _ in range(count):
+        ai = GomokuAI(ttSizeMB=1)  # no search: small transposition table
+        state = rng.choice((1, -1))
+        moves = [(rng.randrange(N), rng.randrange(N), state)]
+        ai.playMove(*moves[0])
+        for _ in range(rng.randrange(max_plies)):
+            if ai.checkResult() is not None:
+                break
+            state = -state
+            i, j = rng.choice(sorted(pos for pos in ai.nextBound if ai.isValid(*pos)))
+            ai.playMove(i, j, state)
+            moves.append((i, j, state))
+        yield ai, moves
+
+
+def check_evaluate(ai):
+    """Cells (i, j, turn) where evaluate and evaluatePatterns disagree"""
+    mismatches = []
+    for i in range(N):
+        for j in range(N):
+            if not ai.isValid(i, j):
+                continue
+            for turn in (1, -1):
+                bound, reference_bound = {}, {}
+                value = ai.evaluate(i, j, 0, turn, bound)
+                reference = ai.evaluatePatterns(i, j, 0, turn, reference_bound)
+                bound = {pos: score for pos, score in bound.items() if score}
+                reference_bound = {pos: score for pos, score in reference_bound.items() if score}
+                if value != reference or bound != reference_bound:
+                    mismatches.append((i, j, turn))
+    return mismatches
+
+
+def check_vectorized(games):
+    """
+        Numbers of the games where the NumPy scores disagree, games =
+        [(boardMap, moves, boardValue, staticScore)] of the engines
+    """
+    from source.vectorized import VectorizedEvaluator
+    evaluator = VectorizedEvaluator()
+    scores = evaluator.scoreBoards([boardMap for boardMap, _, _, _ in games])
+    mismatches = []
+    for number, ((_, moves, value, static), score) in enumerate(zip(games, scores)):
+        if evaluator.scoreMoves(moves) != value or score != static:
+            mismatches.append(number)
+    return mismatches
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare evaluate with the countPattern reference')
+    parser.add_argument('--boards', type=int, default=100, help='random positions (default 100)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random games')
+    parser.add_argument('--vectorized', action='store_true', help='also check the NumPy evaluator')
+    parser.add_argument('--no-evaluate', action='store_true', help='skip the (slow) evaluate check')
+    args = parser.parse_args()
+
+    games = []
+    failed = 0
+    for number, (ai, moves) in enumerate(random_positions(args.boards, args.seed)):
+        games.append((ai.boardMap, moves, ai.boardValue, ai.staticScore()))
+        if args.no_evaluate:
+            continue
+        mismatches = check_evaluate(ai)
+        if mismatches:
+            failed += 1
+            print('MISMATCH board {}: evaluate differs at {}'.format(number, mismatches[:5]))
+            ai.drawBoard()
+    if not args.no_evaluate:
+        print('{} of {} board(s) with evaluate mismatches'.format(failed, args.boards))
+    if args.vectorized:
+        mismatches = check_vectorized(games)
+        for number in mismatches:
+            print('MISMATCH board {}: vectorized score differs, moves {}'.format(number, games[number][1]))
+        print('{} of {} board(s) with vectorized mismatches'.format(len(mismatches), args.boards))
+        failed += len(mismatches)
+    if failed:
+        sys.exit(1)